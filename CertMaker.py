@@ -1,300 +1,54 @@
 import os
-import time
 import sys
 import shutil
 import json
+from copy import deepcopy
+from multiprocessing import freeze_support
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QLineEdit, QPushButton, QFileDialog, QTableWidget,
                              QTableWidgetItem, QMessageBox, QGroupBox, QGridLayout,
-                             QHeaderView, QTextEdit, QCheckBox, QComboBox)
+                             QHeaderView, QTextEdit, QCheckBox, QComboBox, QSpinBox, QProgressBar)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QFont
-from openpyxl import load_workbook
-from docx import Document
-from docxcompose.composer import Composer
+
+from certgen import DocumentGenerator, TemplateCache, PRESETS, load_config_file, format_progress
 
 class WorkerThread(QThread):
     """工作线程，用于处理耗时操作，避免UI卡顿"""
     status_updated = pyqtSignal(str)
+    progress_updated = pyqtSignal(dict) # 汇总进度，按固定间隔发送，不随行数增长
     finished = pyqtSignal(int)
 
     def __init__(self, generator, operation):
         super().__init__()
         self.generator = generator
-        self.operation = operation  # 'generate' 或 'merge'
+        self.operation = operation  # 'generate'、'merge' 或 'preflight'
+        # 逐行结果改走进度通道，状态区只保留阶段信息和错误
+        self.generator.progress.callback = self.progress_updated.emit
 
     def run(self):
         try:
             if self.operation == 'generate':
-                # 生成证书前先清理输出目录中的Word文件
-                self.status_updated.emit("清理输出目录中的原有Word文件...")
-                if os.path.exists(self.generator.output_dir):
-                    for filename in os.listdir(self.generator.output_dir):
-                        if filename.endswith(".docx") and not filename.startswith("~$"):
-                            file_path = os.path.join(self.generator.output_dir, filename)
-                            try:
-                                os.remove(file_path)
-                                self.status_updated.emit(f"已删除: {filename}")
-                            except Exception as e:
-                                self.status_updated.emit(f"删除{filename}失败: {str(e)}")
-                
-                # 生成证书
-                result = self.generator.generate_documents(self.status_updated.emit)
-                
-                # 自动合并证书
-                if result == 0:
-                    self.status_updated.emit("\n开始自动合并证书...")
-                    merge_result = self.generator.merge_docx(self.status_updated.emit)
-                    self.finished.emit(0 if merge_result else 1)
-                else:
-                    self.finished.emit(1)
+                # 生成并自动合并证书
+                result = self.generator.generate_and_merge(self.status_updated.emit)
+                self.finished.emit(result)
             elif self.operation == 'merge':
                 result = self.generator.merge_docx(self.status_updated.emit)
                 self.finished.emit(0 if result else 1)
+            elif self.operation == 'preflight':
+                report = self.generator.preflight(self.status_updated.emit)
+                self.finished.emit(0 if report is not None and report.ok else 1)
         except Exception as e:
             self.status_updated.emit(f"操作出错: {str(e)}")
             self.finished.emit(1)
 
-class DocumentGenerator:
-    def __init__(self, database, template, doc_output, merge_output, replacement_config):
-        self.excel_file = database
-        self.template_file = template
-        self.output_dir = doc_output
-        self.merge_output = merge_output
-        self.replacement_config = replacement_config
-        self.generated_files = [] # 已生成的Word文件列表
-        
-        # 确保输出目录存在
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
-
-    def read_excel_data(self, status_callback):
-        try:
-            excel_start = time.perf_counter()
-            workbook = load_workbook(self.excel_file, data_only=True)
-            sheet = workbook.active
-            status_callback(f"成功加载数据库文件：{self.excel_file}（工作表名：{sheet.title}）")
-
-            headers = [cell.value.strip() if cell.value else "" for cell in sheet[1]]
-            headers = [h for h in headers if h]
-            
-            required_headers = [item["excel_header"] for item in self.replacement_config]
-            missing_headers = [h for h in required_headers if h not in headers]
-            if missing_headers:
-                raise ValueError(f"Excel缺少必要表头：{missing_headers}")
-
-            data = []
-            for row_num, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-                row_data = {}
-                for config in self.replacement_config:
-                    header = config["excel_header"]
-                    col_index = headers.index(header)
-                    cell_value = row[col_index] if col_index < len(row) else ""
-                    row_data[header] = str(cell_value).strip() if cell_value else ""
-                
-                # 必填字段校验
-                required_empty = [cfg["excel_header"] for cfg in self.replacement_config 
-                                 if cfg.get("required", False) and not row_data[cfg["excel_header"]]]
-                if required_empty:
-                    status_callback(f"跳过不完整数据行（第{row_num}行）：必填字段{required_empty}为空")
-                else:
-                    data.append(row_data)
-
-            workbook.close()
-            excel_end = time.perf_counter()
-            status_callback(f"成功读取 {len(data)} 条数据（耗时：{excel_end - excel_start:.2f}秒）")
-            return data
-
-        except FileNotFoundError:
-            status_callback(f"错误：未找到Excel文件「{self.excel_file}」")
-            return []
-        except Exception as e:
-            status_callback(f"读取Excel错误：{str(e)}")
-            return []
-
-    def replace_placeholder_in_run(self, run_text, row_data):
-        if not run_text:
-            return run_text
-        
-        replaced_text = run_text
-        for config in self.replacement_config:
-            placeholder = config["placeholder"]
-            excel_header = config["excel_header"]
-            cell_value = row_data.get(excel_header, "")
-            
-            # 核心逻辑：空值删除占位符，非空按格式替换
-            if not cell_value:  # 数据库值为空 → 删除占位符文本
-                replaced_text = replaced_text.replace(placeholder, "")
-            else:  # 数据库值非空 → 按format格式化替换
-                format_str = config.get("format", "{0}")  # 默认直接替换
-                replaced_text = replaced_text.replace(placeholder, format_str.format(cell_value))
-        return replaced_text
-
-    def process_paragraph(self, paragraph, row_data):
-        if not paragraph.text.strip():
-            return
-        
-        for run in paragraph.runs:
-            original_run_text = run.text
-            if not original_run_text:
-                continue
-            
-            # 检查是否包含任意占位符
-            placeholders = [item["placeholder"] for item in self.replacement_config]
-            has_placeholder = any(ph in original_run_text for ph in placeholders)
-            if not has_placeholder:
-                continue
-            
-            # 替换/删除占位符（保留格式）
-            new_run_text = self.replace_placeholder_in_run(original_run_text, row_data)
-            if new_run_text != original_run_text:
-                run.text = new_run_text
-
-    def replace_placeholders(self, doc, row_data):
-        # 处理普通段落
-        for para in doc.paragraphs:
-            self.process_paragraph(para, row_data)
-        
-        # 处理表格
-        if doc.tables:
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for para in cell.paragraphs:
-                            self.process_paragraph(para, row_data)
-
-    def clean_filename(self, filename):
-        """清理文件名中的非法字符"""
-        invalid_chars = '/\\:*?"<>|' # Windows系统非法字符
-        for char in invalid_chars:
-            filename = filename.replace(char, '_') # 用下划线替换非法字符
-        # 额外处理首尾空格/换行，避免文件名异常
-        filename = filename.strip()
-        return filename
-
-    def generate_documents(self, status_callback):
-        total_start = time.perf_counter()
-        data = self.read_excel_data(status_callback)
-        
-        if not data:
-            status_callback("\n❌ 无有效数据，无法生成证书")
-            return 1
-        
-        # 清空之前的记录
-        self.generated_files = []
-
-        total = len(data)
-        success_count = 0
-        fail_count = 0
-        
-        # 获取文件名字段
-        filename_fields = [cfg["excel_header"] for cfg in self.replacement_config if cfg.get("use_in_filename", False)]
-        if not filename_fields:
-            filename_fields = [self.replacement_config[0]["excel_header"]]
-        
-        for index, item in enumerate(data, start=1):
-            try:
-                doc = Document(self.template_file)  
-                self.replace_placeholders(doc, item)
-                
-                # 生成文件名
-                filename_parts = [str(item[field]) for field in filename_fields if item[field]]
-                raw_filename = "_".join(filename_parts) + ".docx"
-                filename = self.clean_filename(raw_filename)  # 清理非法字符
-                file_path = os.path.join(self.output_dir, filename)
-                doc.save(file_path)
-                
-                # 记录生成的文件路径（按数据库顺序）
-                self.generated_files.append(file_path)
-
-                success_count += 1
-                status_callback(f"已生成：{filename}（{index}/{total}）")
-            except Exception as e:
-                fail_count += 1
-                if "No such file or directory" in str(e) and "docx" in str(e):
-                    status_callback(f"处理{item.get(filename_fields[0], '')}时出错：文件名含非法字符，{str(e)}")
-                else:
-                    status_callback(f"处理{item.get(filename_fields[0], '')}时出错：{str(e)}")
-        
-        # 输出汇总
-        total_end = time.perf_counter()
-        total_elapsed = total_end - total_start
-        status_callback(f"生成完成：{success_count}/{success_count + fail_count}")
-        status_callback(f"总耗时长：{total_elapsed:.2f}秒（平均：{total_elapsed/total:.2f}个/秒）" if total else f"总耗时长：{total_elapsed:.2f}秒")
-        status_callback(f"保存路径：{os.path.abspath(self.output_dir)}")
-
-        return 0 if success_count > 0 else 1
-
-    def merge_docx(self, status_callback):
-        docx_paths = self.generated_files.copy()
-        
-        # 如果没有记录，则回退到原有方式
-        if not docx_paths:
-            status_callback("警告：未找到生成记录，将按文件名排序合并（可能与数据库顺序不一致）")
-            for filename in os.listdir(self.output_dir):
-                if filename.endswith(".docx") and not filename.startswith("~$"):
-                    docx_paths.append(os.path.abspath(os.path.join(self.output_dir, filename)))
-            docx_paths.sort()
-        
-        if not docx_paths:
-            status_callback("错误：未找到有效docx文件！")
-            return None
-
-        main_doc = Document(docx_paths[0])
-        composer = Composer(main_doc)
-        main_section = main_doc.sections[0]
-        main_margins = (main_section.left_margin, main_section.right_margin, main_section.top_margin, main_section.bottom_margin)
-        main_page_size = (main_section.page_width, main_section.page_height)
-
-        total_docs = len(docx_paths)
-        status_callback(f"开始合并 {total_docs} 个文档...")
-        
-        for i, doc_path in enumerate(docx_paths[1:], 1):
-            try:
-                sub_doc = Document(doc_path)
-                for section in sub_doc.sections:
-                    section.left_margin, section.right_margin = main_margins[0], main_margins[1]
-                    section.top_margin, section.bottom_margin = main_margins[2], main_margins[3]
-                    section.page_width, section.page_height = main_page_size[0], main_page_size[1]
-
-                main_doc.add_page_break()
-                composer.append(sub_doc)
-                status_callback(f"已合并 {i+1}/{total_docs} 个文档")
-            except Exception as e:
-                status_callback(f"合并 {os.path.basename(doc_path)} 时出错：{str(e)}")
-
-        composer.save(self.merge_output)
-        status_callback(f"\n合并完成！")
-        status_callback(f"保存路径：{os.path.abspath(self.merge_output)}")
-        return self.merge_output
-
 class CertificateGeneratorGUI(QMainWindow):
+    max_log_lines = 2000 # 状态信息最多保留的行数
+
     def __init__(self):
         super().__init__()
         # 预设配置数据
-        self.presets = {
-            "就业创业培训": [
-                {"excel_header": "姓名", "placeholder": "湖小招", "format": "{0}", "required": True, "use_in_filename": True},
-                {"excel_header": "学号", "placeholder": "14242300000", "format": "{0}", "required": True, "use_in_filename": True},
-                {"excel_header": "项目", "placeholder": "XXXX", "format": "{0}", "required": True, "use_in_filename": False},
-                {"excel_header": "学时", "placeholder": "（学时）", "format": "（{0}学时）", "required": True, "use_in_filename": False},
-            ],
-            "职业规划大赛": [
-                {"excel_header": "姓名", "placeholder": "湖小招", "format": "{0}", "required": True, "use_in_filename": True},
-                {"excel_header": "赛道", "placeholder": "XXXX", "format": "{0}", "required": True, "use_in_filename": False},
-                {"excel_header": "奖项", "placeholder": "特等奖", "format": "{0}", "required": True, "use_in_filename":False},
-                {"excel_header": "指导老师", "placeholder": "指导老师：", "format": "指导老师：{0}", "required": False, "use_in_filename": False},
-                {"excel_header": "团队成员", "placeholder": "团队成员：", "format": "团队成员：{0}", "required": False, "use_in_filename": False}
-            ],
-            "金种子": [
-                {"excel_header": "项目名称", "placeholder": "AAA", "format": "{0}", "required": True, "use_in_filename": True},
-                {"excel_header": "赛道", "placeholder": "XXXX", "format": "{0}", "required": True, "use_in_filename": False},
-                {"excel_header": "奖项", "placeholder": "特等奖", "format": "{0}", "required": True, "use_in_filename": False},
-                {"excel_header": "团队成员", "placeholder": "团队成员：", "format": "团队成员：{0}", "required": True, "use_in_filename": False},
-                {"excel_header": "指导老师", "placeholder": "指导老师：", "format": "指导老师：{0}", "required": False, "use_in_filename": False}
-            ],
-            "自定义": []  # 初始为空，用户自定义时保存
-        }
+        self.presets = deepcopy(PRESETS)
         self.initUI()
         self.worker = None
         
@@ -313,7 +67,7 @@ class CertificateGeneratorGUI(QMainWindow):
         path_layout = QGridLayout()
         
         # Excel数据库文件
-        path_layout.addWidget(QLabel("数据库（Excel文件）:"), 0, 0)
+        path_layout.addWidget(QLabel("数据库（Excel/CSV/SQLite）:"), 0, 0)
         self.excel_path = QLineEdit("./数据库.xlsx")
         path_layout.addWidget(self.excel_path, 0, 1)
         self.btn_excel = QPushButton("浏览...")
@@ -344,6 +98,71 @@ class CertificateGeneratorGUI(QMainWindow):
         self.btn_merge.clicked.connect(self.select_merge_file)
         path_layout.addWidget(self.btn_merge, 3, 2)
         
+        # 并行进程数
+        path_layout.addWidget(QLabel("并行进程数:"), 4, 0)
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setRange(1, os.cpu_count() or 1)
+        self.workers_spinbox.setValue(1)
+        path_layout.addWidget(self.workers_spinbox, 4, 1)
+        
+        # 流式读取Excel
+        self.stream_rows_checkbox = QCheckBox("边读取边生成（适合大表格）")
+        path_layout.addWidget(self.stream_rows_checkbox, 5, 2)
+        
+        # 增量生成
+        self.incremental_checkbox = QCheckBox("增量生成（只重建有变化的证书）")
+        path_layout.addWidget(self.incremental_checkbox, 6, 2)
+        
+        # 直接合并模式
+        self.direct_merge_checkbox = QCheckBox("仅输出合并文件（不保存单个证书）")
+        path_layout.addWidget(self.direct_merge_checkbox, 4, 2)
+        
+        # 合并方式
+        path_layout.addWidget(QLabel("合并方式:"), 5, 0)
+        self.merge_engine_combobox = QComboBox()
+        self.merge_engine_combobox.addItem("快速合并（同模板证书）", "fast")
+        self.merge_engine_combobox.addItem("兼容合并（docxcompose）", "composer")
+        self.merge_engine_combobox.addItem("流式合并（同模板，内存占用恒定）", "stream")
+        path_layout.addWidget(self.merge_engine_combobox, 5, 1)
+        
+        # 分卷合并
+        path_layout.addWidget(QLabel("每卷证书数:"), 6, 0)
+        self.volume_size_spinbox = QSpinBox()
+        self.volume_size_spinbox.setRange(0, 1000000)
+        self.volume_size_spinbox.setSpecialValueText("不分卷")
+        path_layout.addWidget(self.volume_size_spinbox, 6, 1)
+        
+        # PDF导出
+        path_layout.addWidget(QLabel("导出PDF:"), 7, 0)
+        self.pdf_mode_combobox = QComboBox()
+        self.pdf_mode_combobox.addItem("不导出", None)
+        self.pdf_mode_combobox.addItem("转换合并文件（需安装 LibreOffice）", "merged")
+        self.pdf_mode_combobox.addItem("转换每个证书（需安装 LibreOffice）", "each")
+        path_layout.addWidget(self.pdf_mode_combobox, 7, 1)
+        
+        # 断点续做
+        self.resume_checkbox = QCheckBox("断点续做（从上次中断处继续）")
+        path_layout.addWidget(self.resume_checkbox, 7, 2)
+        
+        # 图片压缩方式
+        path_layout.addWidget(QLabel("证书图片压缩:"), 8, 0)
+        self.media_compression_combobox = QComboBox()
+        self.media_compression_combobox.addItem("标准压缩", "deflate")
+        self.media_compression_combobox.addItem("快速压缩", "fast")
+        self.media_compression_combobox.addItem("不压缩（生成最快）", "store")
+        path_layout.addWidget(self.media_compression_combobox, 8, 1)
+        
+        # 流水线
+        self.pipeline_checkbox = QCheckBox("流水线（生成、保存、合并同时进行）")
+        path_layout.addWidget(self.pipeline_checkbox, 8, 2)
+        
+        # 渲染引擎
+        path_layout.addWidget(QLabel("渲染方式:"), 9, 0)
+        self.render_engine_combobox = QComboBox()
+        self.render_engine_combobox.addItem("标准（python-docx）", "docx")
+        self.render_engine_combobox.addItem("高速（直接生成XML）", "xml")
+        path_layout.addWidget(self.render_engine_combobox, 9, 1)
+        
         path_group.setLayout(path_layout)
         main_layout.addWidget(path_group)
         
@@ -404,19 +223,31 @@ class CertificateGeneratorGUI(QMainWindow):
         self.btn_generate.setMinimumHeight(40)
         self.btn_generate.clicked.connect(self.generate_and_merge_certificates)
         
+        self.btn_preflight = QPushButton("预检数据")
+        self.btn_preflight.setMinimumHeight(40)
+        self.btn_preflight.clicked.connect(self.preflight_certificates)
+        
         self.btn_clear_status = QPushButton("清空状态信息")
         self.btn_clear_status.setMinimumHeight(40)
         self.btn_clear_status.clicked.connect(self.clear_status)
         
         btn_group.addWidget(self.btn_generate)
+        btn_group.addWidget(self.btn_preflight)
         btn_group.addWidget(self.btn_clear_status)
         main_layout.addLayout(btn_group)
         
         # 创建状态输出区域
         status_group = QGroupBox("状态信息")
         status_layout = QVBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFormat("%v/%m")
+        status_layout.addWidget(self.progress_bar)
+        self.progress_label = QLabel("")
+        status_layout.addWidget(self.progress_label)
         self.status_text = QTextEdit()
         self.status_text.setReadOnly(True)
+        # 日志只保留最近的若干行，避免大批量时内存无限增长
+        self.status_text.document().setMaximumBlockCount(self.max_log_lines)
         status_layout.addWidget(self.status_text)
         status_group.setLayout(status_layout)
         main_layout.addWidget(status_group)
@@ -525,22 +356,14 @@ class CertificateGeneratorGUI(QMainWindow):
             return
         
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                configs = json.load(f)
-            
-            # 验证配置格式
-            if not isinstance(configs, list):
-                raise ValueError("配置文件格式不正确")
+            # 读取并验证配置格式
+            configs = load_config_file(filename)
             
             # 清空当前表格并加载导入的配置
             while self.replace_table.rowCount() > 0:
                 self.replace_table.removeRow(0)
             
             for config in configs:
-                # 验证必要字段
-                if not all(key in config for key in ["excel_header", "placeholder"]):
-                    raise ValueError("配置文件缺少必要字段")
-                
                 self.add_row(config)
             
             # 切换到自定义预设并保存
@@ -603,7 +426,10 @@ class CertificateGeneratorGUI(QMainWindow):
         return config
     
     def select_excel(self):
-        filename, _ = QFileDialog.getOpenFileName(self, "选择Excel数据库", "", "Excel文件 (*.xlsx *.xls)")
+        filename, _ = QFileDialog.getOpenFileName(self, "选择数据库", "",
+                                                  "数据文件 (*.xlsx *.xlsm *.csv *.tsv *.db *.sqlite *.sqlite3);;"
+                                                  "Excel文件 (*.xlsx *.xlsm);;CSV文件 (*.csv *.tsv);;"
+                                                  "SQLite数据库 (*.db *.sqlite *.sqlite3)")
         if filename:
             self.excel_path.setText(filename)
     
@@ -630,15 +456,21 @@ class CertificateGeneratorGUI(QMainWindow):
         # 强制刷新UI
         QApplication.processEvents()
     
+    def update_progress(self, progress):
+        """刷新进度条和速度/剩余时间"""
+        processed = progress["done"] + progress["failed"]
+        self.progress_bar.setMaximum(progress["total"] or 0) # 总数未知时显示为忙碌状态
+        self.progress_bar.setValue(processed)
+        self.progress_label.setText(format_progress(progress))
+    
     def clear_status(self):
         """清空状态信息"""
         self.status_text.clear()
+        self.progress_bar.reset()
+        self.progress_label.clear()
     
-    def generate_and_merge_certificates(self):
-        """生成并合并证书（一步完成）"""
-        # 清空状态
-        self.clear_status()
-        
+    def build_generator(self):
+        """按界面上的配置创建生成器；配置或文件有误时提示并返回 None"""
         # 如果当前是自定义预设，先保存
         if self.preset_combobox.currentText() == "自定义":
             self.save_custom_preset()
@@ -646,7 +478,7 @@ class CertificateGeneratorGUI(QMainWindow):
         # 获取配置
         replacement_config = self.get_replacement_config()
         if not replacement_config:
-            return
+            return None
         
         # 获取路径
         excel_file = self.excel_path.text().strip()
@@ -656,41 +488,78 @@ class CertificateGeneratorGUI(QMainWindow):
         
         # 验证文件存在
         if not os.path.exists(excel_file):
-            QMessageBox.critical(self, "错误", f"Excel文件不存在: {excel_file}")
-            return
+            QMessageBox.critical(self, "错误", f"数据库文件不存在: {excel_file}")
+            return None
         
         if not os.path.exists(template_file):
             QMessageBox.critical(self, "错误", f"模板文件不存在: {template_file}")
-            return
+            return None
         
-        # 禁用生成按钮，防止重复点击
+        return DocumentGenerator(excel_file, template_file, output_dir, merge_file, replacement_config,
+                                 workers=self.workers_spinbox.value(),
+                                 direct_merge=self.direct_merge_checkbox.isChecked(),
+                                 merge_engine=self.merge_engine_combobox.currentData(),
+                                 volume_size=self.volume_size_spinbox.value(),
+                                 pdf_mode=self.pdf_mode_combobox.currentData(),
+                                 stream_rows=self.stream_rows_checkbox.isChecked(),
+                                 incremental=self.incremental_checkbox.isChecked(),
+                                 resume=self.resume_checkbox.isChecked(),
+                                 media_compression=self.media_compression_combobox.currentData(),
+                                 pipeline=self.pipeline_checkbox.isChecked(),
+                                 render_engine=self.render_engine_combobox.currentData(),
+                                 disk_cache=TemplateCache()) # 同一模板和配置再次运行时跳过模板分析
+    
+    def start_operation(self, operation, message):
+        """在工作线程中执行生成或预检"""
+        # 清空状态
+        self.clear_status()
+        
+        # 禁用操作按钮，防止重复点击
         self.btn_generate.setEnabled(False)
+        self.btn_preflight.setEnabled(False)
         
         # 创建生成器和工作线程
         try:
-            generator = DocumentGenerator(excel_file, template_file, output_dir, merge_file, replacement_config)
-            self.worker = WorkerThread(generator, 'generate')
+            generator = self.build_generator()
+            if generator is None:
+                self.btn_generate.setEnabled(True)
+                self.btn_preflight.setEnabled(True)
+                return
+            self.worker = WorkerThread(generator, operation)
             self.worker.status_updated.connect(self.log_status)
+            self.worker.progress_updated.connect(self.update_progress)
             self.worker.finished.connect(self.on_operation_finished)
-            self.log_status("开始生成并合并证书...")
+            self.log_status(message)
             self.worker.start()
         except Exception as e:
             self.log_status(f"初始化出错: {str(e)}")
             self.btn_generate.setEnabled(True)
+            self.btn_preflight.setEnabled(True)
+    
+    def generate_and_merge_certificates(self):
+        """生成并合并证书（一步完成）"""
+        self.start_operation('generate', "开始生成并合并证书...")
+    
+    def preflight_certificates(self):
+        """预检：一次性检查整张表和模板，不生成文件"""
+        self.start_operation('preflight', "开始预检数据...")
     
     def on_operation_finished(self, result):
         """操作完成后的回调"""
         self.btn_generate.setEnabled(True)
+        self.btn_preflight.setEnabled(True)
+        preflight = self.worker.operation == 'preflight'
         if result == 0:
-            QMessageBox.information(self, "成功", "证书生成和合并完成！")
+            QMessageBox.information(self, "成功", "预检通过，未发现问题" if preflight else "证书生成和合并完成！")
         else:
-            QMessageBox.warning(self, "警告", "操作过程中出现错误")
+            QMessageBox.warning(self, "警告", "预检发现问题，详见状态信息" if preflight else "操作过程中出现错误")
         self.worker = None
 
 if __name__ == "__main__":
+    freeze_support() # 打包为exe后进程池需要
     app = QApplication(sys.argv)
     # 确保中文显示正常
     font = QFont("SimHei")
     app.setFont(font)
     window = CertificateGeneratorGUI()
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
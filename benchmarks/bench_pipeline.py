@@ -0,0 +1,201 @@
+"""分阶段性能基准：合成 Excel 数据库和不同复杂度的模板，分别测量各阶段耗时
+
+测量的阶段：
+    read      read_excel_data 读取并校验整张表
+    replace   replace_placeholders 在已加载的模板上做替换（每行重新加载模板，加载时间不计入）
+    generate  generate_documents 生成全部单个证书
+    merge     merge_docx 合并全部证书
+
+每个阶段在独立的子进程中运行，以便单独统计峰值内存（RSS）。结果以 JSON 输出，
+便于不同版本之间对比回归。
+
+用法：
+    python benchmarks/bench_pipeline.py --rows 1000 10000 --templates simple tables many_runs
+    python benchmarks/bench_pipeline.py --rows 100000 --stages read generate --output result.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from certgen import DocumentGenerator, PRESETS  # noqa: E402
+
+CONFIG = PRESETS["就业创业培训"]
+TEMPLATES = ("simple", "tables", "many_runs")
+STAGES = ("read", "replace", "generate", "merge")
+
+
+def peak_rss_mb():
+    """当前进程的峰值内存（MB），无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024  # Windows
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / 1024 / 1024 if sys.platform == "darwin" else usage / 1024
+
+
+def make_workbook(path, rows):
+    """合成数据库：表头与预设“就业创业培训”一致"""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([cfg["excel_header"] for cfg in CONFIG])
+    for i in range(rows):
+        sheet.append([f"学生{i:06d}", str(14242300000 + i), f"项目{i % 17}", str(8 + i % 40)])
+    workbook.save(path)
+
+
+def make_template(path, kind):
+    """合成模板：simple 只有几个段落；tables 含合并单元格的表格；many_runs 每段拆成很多run"""
+    from docx import Document
+    doc = Document()
+    doc.add_heading("荣誉证书", 0)
+    doc.add_paragraph("兹证明 湖小招 同学（学号：14242300000）")
+    doc.add_paragraph("参加 XXXX 培训，完成（学时）。")
+    if kind == "tables":
+        for _ in range(3):
+            table = doc.add_table(rows=4, cols=4)
+            table.cell(0, 0).merge(table.cell(0, 3)).text = "姓名：湖小招"
+            for r in range(1, 4):
+                for c in range(4):
+                    table.cell(r, c).text = "XXXX" if (r + c) % 3 == 0 else f"单元格{r}{c}"
+    elif kind == "many_runs":
+        for i in range(50):
+            paragraph = doc.add_paragraph()
+            for j in range(10):
+                run = paragraph.add_run("湖小招" if (i + j) % 7 == 0 else f"文本{i}-{j} ")
+                run.bold = j % 2 == 0
+    doc.add_paragraph("特发此证。")
+    doc.save(path)
+
+
+def prepare(workdir, rows, kind):
+    """生成（或复用）该规模的数据库和模板，返回路径"""
+    os.makedirs(workdir, exist_ok=True)
+    excel_file = os.path.join(workdir, f"rows_{rows}.xlsx")
+    template_file = os.path.join(workdir, f"template_{kind}.docx")
+    if not os.path.exists(excel_file):
+        make_workbook(excel_file, rows)
+    if not os.path.exists(template_file):
+        make_template(template_file, kind)
+    return excel_file, template_file
+
+
+def run_stage(stage, excel_file, template_file, output_dir, args):
+    """在当前进程中运行一个阶段，返回测量结果"""
+    generator = DocumentGenerator(excel_file, template_file, output_dir, output_dir + ".docx", CONFIG,
+                                  workers=args.workers, merge_engine=args.merge_engine, render_engine=args.render_engine)
+    messages = []
+    start = time.perf_counter()
+    if stage == "read":
+        count = len(generator.read_excel_data(messages.append))
+    elif stage == "replace":
+        from docx import Document
+        data = generator.read_excel_data(messages.append)[:args.replace_sample]
+        start = time.perf_counter()
+        elapsed_load = 0.0
+        for item in data:
+            load_start = time.perf_counter()
+            doc = Document(template_file)
+            elapsed_load += time.perf_counter() - load_start
+            generator.replace_placeholders(doc, item)
+        count = len(data)
+        start += elapsed_load  # 扣除模板加载时间
+    elif stage == "generate":
+        generator.clean_output_dir(messages.append)
+        if generator.generate_documents(messages.append) != 0:
+            raise RuntimeError("\n".join(messages[-5:]))
+        count = len(generator.generated_files)
+    elif stage == "merge":
+        generator.generated_files = sorted(os.path.join(output_dir, f) for f in os.listdir(output_dir)
+                                           if f.endswith(".docx"))
+        if not generator.merge_docx(messages.append):
+            raise RuntimeError("\n".join(messages[-5:]))
+        count = len(generator.generated_files)
+    else:
+        raise ValueError(f"未知阶段：{stage}")
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    return {"rows": count, "seconds": round(elapsed, 4),
+            "rows_per_sec": round(count / elapsed, 2) if elapsed > 0 else None,
+            "peak_rss_mb": round(peak, 1) if peak is not None else None}
+
+
+def measure(stage, rows, kind, args):
+    """在子进程中运行一个阶段，保证峰值内存互不影响"""
+    excel_file, template_file = prepare(args.workdir, rows, kind)
+    output_dir = os.path.join(args.workdir, f"out_{rows}_{kind}")
+    command = [sys.executable, os.path.abspath(__file__), "--run-stage", stage, excel_file, template_file,
+               output_dir, "--workers", str(args.workers), "--merge-engine", args.merge_engine,
+               "--render-engine", args.render_engine,
+               "--replace-sample", str(args.replace_sample)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    result = {"stage": stage, "template": kind, "dataset_rows": rows}
+    if completed.returncode != 0:
+        result["error"] = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "失败"
+        return result
+    result.update(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="证书生成各阶段性能基准")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000], help="数据行数，可多个")
+    parser.add_argument("--templates", nargs="+", choices=TEMPLATES, default=list(TEMPLATES), help="模板复杂度")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="要测量的阶段")
+    parser.add_argument("--workers", type=int, default=1, help="generate 阶段的并行进程数")
+    parser.add_argument("--merge-engine", choices=DocumentGenerator.merge_engines, default="fast")
+    parser.add_argument("--render-engine", choices=DocumentGenerator.render_engines, default="docx",
+                        help="generate 阶段的渲染方式")
+    parser.add_argument("--replace-sample", type=int, default=200, help="replace 阶段最多测量的行数")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "certmaker_bench"),
+                        help="合成数据与输出目录（数据会被复用）")
+    parser.add_argument("--output", help="结果写入的JSON文件，默认输出到标准输出")
+    parser.add_argument("--run-stage", nargs=4, metavar=("STAGE", "EXCEL", "TEMPLATE", "OUTPUT_DIR"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_stage:
+        stage, excel_file, template_file, output_dir = args.run_stage
+        print(json.dumps(run_stage(stage, excel_file, template_file, output_dir, args)))
+        return 0
+
+    results = []
+    for rows in args.rows:
+        for kind in args.templates:
+            for stage in args.stages:
+                result = measure(stage, rows, kind, args)
+                results.append(result)
+                print(json.dumps(result, ensure_ascii=False), file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "workers": args.workers,
+        "merge_engine": args.merge_engine,
+        "render_engine": args.render_engine,
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if any("error" in result for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
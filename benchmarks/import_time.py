@@ -0,0 +1,68 @@
+"""导入耗时基准：检查引擎的冷启动预算
+
+每次在全新的解释器中导入目标模块，取多次的中位数与预算比较，
+同时确认 PyQt5、python-docx、openpyxl、docxcompose 没有在导入阶段被加载。
+超出预算或加载了重量级依赖时退出码为 1，可直接放进 CI。
+
+用法：
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --module certgen.cli --budget-ms 80 --repeat 9
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 引擎导入时不应加载的重量级依赖
+HEAVY_MODULES = ["PyQt5", "docx", "openpyxl", "docxcompose", "lxml"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, repeat):
+    """在独立进程中导入 repeat 次，返回每次耗时（毫秒）和被加载的重量级模块"""
+    timings = []
+    loaded = set()
+    code = PROBE.format(module=module, heavy=HEAVY_MODULES)
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["ms"])
+        loaded.update(result["loaded"])
+    return timings, sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="测量引擎模块的冷启动导入耗时")
+    parser.add_argument("--module", action="append", help="要测量的模块，可重复，默认 certgen 和 certgen.cli")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="导入耗时中位数上限（毫秒）")
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块测量次数")
+    args = parser.parse_args(argv)
+
+    failed = False
+    report = []
+    for module in args.module or ["certgen", "certgen.cli"]:
+        timings, loaded = measure(module, args.repeat)
+        median = statistics.median(timings)
+        ok = median <= args.budget_ms and not loaded
+        failed = failed or not ok
+        report.append({"module": module, "median_ms": round(median, 2), "min_ms": round(min(timings), 2),
+                       "budget_ms": args.budget_ms, "heavy_modules_loaded": loaded, "ok": ok})
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
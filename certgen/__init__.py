@@ -0,0 +1,12 @@
+"""证书生成引擎：不依赖 PyQt5，GUI（CertMaker.py）与命令行（python -m certgen）共用"""
+from .template import PlaceholderMatcher, CompiledTemplate
+from .merger import FastMerger, StreamingMerger
+from .media import save_document, deduplicate_media
+from .pdf import PdfConverter, find_soffice
+from .cache import TemplateCache
+from .sources import RowSource, ExcelSource, CsvSource, SqliteSource, open_row_source
+from .generator import DocumentGenerator
+from .jobs import JobRunner, load_job_file
+from .progress import ProgressReporter, format_progress
+from .profiling import Instrumentation, TraceRecorder
+from .presets import PRESETS, load_config_file
@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+from .template import CompiledTemplate
+
+class TemplateCache:
+    """磁盘上的预编译模板缓存，以模板文件内容和替换配置为键
+
+    每个条目为两个文件：<键>.docx 为已归并跨run占位符的模板，<键>.json 为含占位符的run位置和
+    模板中出现的占位符。命中时只需解析模板，不再逐段遍历和匹配。超过 max_age_days 未使用的条目、
+    以及总大小超过 max_bytes 时最久未使用的条目，在写入新条目时删除。
+    """
+    format_version = 1
+
+    def __init__(self, root=None, max_bytes=256 * 1024 * 1024, max_age_days=30):
+        self.root = root or os.path.join(tempfile.gettempdir(), "certmaker_cache")
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+
+    def get_key(self, template_hash, replacement_config):
+        import docx # 首次使用时才导入；python-docx 版本不同时缓存失效
+        key = json.dumps([self.format_version, getattr(docx, "__version__", ""), template_hash, replacement_config],
+                         ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get_paths(self, key):
+        base = os.path.join(self.root, key)
+        return base + ".docx", base + ".json"
+
+    def load(self, key, template_file, matcher):
+        """读取缓存，未命中或条目损坏时返回 None"""
+        document_path, index_path = self.get_paths(key)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            with open(document_path, "rb") as f:
+                document_bytes = f.read()
+            template = CompiledTemplate.from_index(template_file, matcher, document_bytes,
+                                                   index["runs"], index["found_placeholders"])
+        except Exception:
+            return None
+        if template is not None:
+            # 以修改时间作为最近使用时间，清理时先删最久未用的条目
+            now = time.time()
+            for path in (document_path, index_path):
+                try:
+                    os.utime(path, (now, now))
+                except OSError:
+                    pass
+        return template
+
+    def store(self, key, template):
+        """写入缓存（先写临时文件再替换，多个进程同时写入同一条目也不会损坏），然后清理过期条目"""
+        document_bytes, runs, found_placeholders = template.export_index()
+        os.makedirs(self.root, exist_ok=True)
+        document_path, index_path = self.get_paths(key)
+        suffix = f".{os.getpid()}.tmp"
+        with open(document_path + suffix, "wb") as f:
+            f.write(document_bytes)
+        os.replace(document_path + suffix, document_path)
+        # 索引最后写入，读取时以索引存在作为条目完整的标志
+        with open(index_path + suffix, "w", encoding="utf-8") as f:
+            json.dump({"runs": runs, "found_placeholders": found_placeholders}, f, ensure_ascii=False)
+        os.replace(index_path + suffix, index_path)
+        self.prune()
+
+    def prune(self):
+        """删除过期条目；总大小超出上限时按最近使用时间从旧到新删除"""
+        entries = {}
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            key, ext = os.path.splitext(name)
+            if ext not in (".docx", ".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except OSError:
+                continue
+            size, mtime = entries.get(key, (0, 0))
+            entries[key] = (size + stat.st_size, max(mtime, stat.st_mtime))
+
+        expire_before = time.time() - self.max_age_days * 86400
+        total = sum(size for size, _ in entries.values())
+        for key, (size, mtime) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if mtime >= expire_before and total <= self.max_bytes:
+                break
+            self.remove(key)
+            total -= size
+
+    def remove(self, key):
+        for path in self.get_paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,173 @@
+"""命令行入口：无需 PyQt5 和显示器，适合定时任务与容器中批量运行
+
+示例：
+    python -m certgen -d 数据库.xlsx -t 模板.docx -o ./生成的证书 -m ./生成的证书.docx --preset 就业创业培训
+    python -m certgen -d 数据库.xlsx -t 模板.docx --config 配置.json --workers 4 --merge-engine fast
+    python -m certgen -d 数据库.xlsx -t 模板.docx --preset 就业创业培训 --pdf merged
+    python -m certgen --jobs 任务.json --workers 4
+    python -m certgen -d 数据库.xlsx -t 模板.docx --preset 就业创业培训 --dry-run
+
+退出码：0 成功，1 生成或合并失败（有任意一个证书失败即为 1，其余证书照常输出），2 参数或配置错误
+"""
+import argparse
+import os
+import sys
+
+from .generator import DocumentGenerator
+from .jobs import JobRunner, load_job_file
+from .cache import TemplateCache
+from .sources import SQLITE_EXTENSIONS
+from .presets import PRESETS, load_config_file
+from .progress import format_progress
+from .profiling import TraceRecorder
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="certgen", description="批量生成证书并合并为一个文件（命令行版）")
+    parser.add_argument("-d", "--database", default="./数据库.xlsx", help="数据库路径：Excel（.xlsx）、CSV（.csv/.tsv，UTF-8 或 GBK）或 SQLite（.db/.sqlite/.sqlite3）")
+    parser.add_argument("-t", "--template", default="./模板.docx", help="模板（Word文件）路径")
+    parser.add_argument("-o", "--output-dir", default="./生成的证书（未合并）", help="单个证书的输出目录")
+    parser.add_argument("-m", "--merge-output", default="./生成的证书.docx", help="合并文件路径")
+    config_group = parser.add_mutually_exclusive_group(required=True)
+    config_group.add_argument("--preset", choices=[name for name, configs in PRESETS.items() if configs],
+                              help="使用内置预设")
+    config_group.add_argument("--config", help="替换配置文件（GUI“导出配置”生成的JSON）")
+    config_group.add_argument("--jobs", metavar="任务文件",
+                              help="批量任务（JSON）：依次运行多个 数据库/工作表/模板/预设 组合，共用进程池，"
+                                   "此时忽略 -d/-t/-o/-m/--sheet/--query")
+    parser.add_argument("--sheet", help="读取的工作表名，默认为活动工作表；SQLite 数据库为表名")
+    parser.add_argument("--query", metavar="SQL", help="SQLite 数据库的查询语句（如筛选某一批次），指定后忽略 --sheet")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数，默认 1（串行）")
+    parser.add_argument("--merge-engine", choices=DocumentGenerator.merge_engines, default="fast",
+                        help="合并方式：fast 快速合并（同模板），composer 兼容合并（docxcompose），stream 流式合并（同模板，内存占用恒定）")
+    parser.add_argument("--media-compression", choices=DocumentGenerator.media_compressions, default="deflate",
+                        help="单个证书中图片的压缩方式：deflate 默认，fast 最快压缩，store 不压缩（图片本身已压缩，体积几乎不变）")
+    parser.add_argument("--render-engine", choices=DocumentGenerator.render_engines, default="docx",
+                        help="单个证书的渲染方式：docx 经 python-docx 对象模型，xml 直接拼接XML字节（快得多，直接合并模式不适用）")
+    parser.add_argument("--direct-merge", action="store_true", help="仅输出合并文件，不保存单个证书")
+    parser.add_argument("--stream", action="store_true", help="边读取数据边生成（适合大表格）")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="流水线：读取、渲染、保存（压缩写盘）同时进行，同模板合并（fast/stream）与生成同时进行")
+    parser.add_argument("--queue-size", type=int, default=32, metavar="N",
+                        help="流水线各阶段之间最多排队的证书数，限制内存占用，默认 32")
+    parser.add_argument("--cache-dir", metavar="目录", help="预编译模板缓存目录，默认在系统临时目录下")
+    parser.add_argument("--no-template-cache", action="store_true", help="不使用预编译模板缓存，每次重新解析模板")
+    parser.add_argument("--incremental", action="store_true", help="增量生成，只重建有变化的证书")
+    parser.add_argument("--resume", action="store_true",
+                        help="从上次中断处继续：跳过断点日志中已完成的证书和分卷，不清理输出目录（直接合并模式不适用）")
+    parser.add_argument("--no-merge", action="store_true", help="只生成单个证书，不合并")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="只做预检：一次性报告必填字段为空、文件名重复、模板中缺少的占位符等问题，不生成文件")
+    parser.add_argument("--volume-size", type=int, default=0, metavar="N",
+                        help="合并结果按每卷 N 个证书拆分为多个文件，各卷按 --workers 并行合并（直接合并模式不适用）")
+    parser.add_argument("--pdf", choices=DocumentGenerator.pdf_modes,
+                        help="生成后用 LibreOffice 导出PDF：merged 转换合并文件，each 转换每个证书（未安装时跳过）")
+    parser.add_argument("--soffice", metavar="路径", help="LibreOffice 的 soffice 可执行文件，默认自动查找")
+    parser.add_argument("--pdf-timeout", type=float, metavar="秒",
+                        help="每批PDF转换的超时秒数，0 表示不限时；默认按文件大小自动计算（大的合并文件相应放宽）")
+    parser.add_argument("--progress", type=float, nargs="?", const=1.0, metavar="秒",
+                        help="不逐行输出，改为每隔指定秒数（默认 1）输出一行汇总进度")
+    parser.add_argument("--trace", metavar="文件", help="导出逐行分阶段耗时（.json 含汇总，.csv 为逐条记录）")
+    parser.add_argument("--profile", action="store_true", help="同时用 cProfile 采样，结果保存为 <trace>.prof")
+    parser.add_argument("--trace-memory", action="store_true", help="同时用 tracemalloc 统计内存分配最多的代码行")
+    return parser
+
+
+def get_disk_cache(args):
+    return None if args.no_template_cache else TemplateCache(args.cache_dir)
+
+
+def run_jobs(args):
+    """--jobs：按任务文件运行多个任务，其余命令行选项对每个任务生效"""
+    try:
+        jobs = load_job_file(args.jobs)
+    except Exception as e:
+        print(f"读取任务文件出错: {str(e)}", file=sys.stderr)
+        return 2
+    for job in jobs:
+        for path in (job["database"], job["template"]):
+            if not os.path.exists(path):
+                print(f"错误：任务「{job['name']}」的文件不存在: {path}", file=sys.stderr)
+                return 2
+    if args.trace:
+        print("错误：--jobs 不支持 --trace，请对单个任务分别导出耗时", file=sys.stderr)
+        return 2
+
+    runner = JobRunner(jobs, workers=args.workers, direct_merge=args.direct_merge,
+                       merge_engine=args.merge_engine, stream_rows=args.stream, incremental=args.incremental,
+                       volume_size=args.volume_size, pdf_mode=args.pdf, soffice=args.soffice,
+                       pdf_timeout=args.pdf_timeout, resume=args.resume,
+                       media_compression=args.media_compression, pipeline=args.pipeline, queue_size=args.queue_size,
+                       disk_cache=get_disk_cache(args), render_engine=args.render_engine,
+                       progress_interval=args.progress if args.progress is not None else 0.2)
+    status_callback = lambda message: print(message, flush=True)
+    progress_callback = None
+    if args.progress is not None:
+        progress_callback = lambda progress: print(format_progress(progress), flush=True)
+    try:
+        return runner.run(status_callback, merge=not args.no_merge, progress_callback=progress_callback,
+                          dry_run=args.dry_run)
+    except KeyboardInterrupt:
+        print("已中断", file=sys.stderr)
+        return 1
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.jobs:
+        return run_jobs(args)
+    if args.config:
+        try:
+            replacement_config = load_config_file(args.config)
+        except Exception as e:
+            print(f"读取配置文件出错: {str(e)}", file=sys.stderr)
+            return 2
+    else:
+        replacement_config = PRESETS[args.preset]
+    if not replacement_config:
+        print("错误：替换配置为空", file=sys.stderr)
+        return 2
+
+    # 验证文件存在
+    if not os.path.exists(args.database):
+        print(f"错误：数据库文件不存在: {args.database}", file=sys.stderr)
+        return 2
+    if args.query and not args.database.lower().endswith(SQLITE_EXTENSIONS):
+        print("错误：--query 只适用于 SQLite 数据库", file=sys.stderr)
+        return 2
+    if not os.path.exists(args.template):
+        print(f"错误：模板文件不存在: {args.template}", file=sys.stderr)
+        return 2
+
+    if (args.profile or args.trace_memory) and not args.trace:
+        print("错误：--profile / --trace-memory 需要同时指定 --trace", file=sys.stderr)
+        return 2
+    instrumentation = None
+    if args.trace:
+        instrumentation = TraceRecorder(args.trace, profile=args.profile, trace_memory=args.trace_memory)
+
+    generator = DocumentGenerator(args.database, args.template, args.output_dir, args.merge_output,
+                                  replacement_config, workers=args.workers, direct_merge=args.direct_merge,
+                                  merge_engine=args.merge_engine, stream_rows=args.stream,
+                                  incremental=args.incremental, instrumentation=instrumentation,
+                                  volume_size=args.volume_size, pdf_mode=args.pdf, soffice=args.soffice,
+                                  pdf_timeout=args.pdf_timeout, resume=args.resume,
+                                  media_compression=args.media_compression, sheet=args.sheet, query=args.query,
+                                  pipeline=args.pipeline, queue_size=args.queue_size, disk_cache=get_disk_cache(args),
+                                  render_engine=args.render_engine)
+    status_callback = lambda message: print(message, flush=True)
+    if args.progress is not None:
+        generator.progress.interval = args.progress
+        generator.progress.callback = lambda progress: print(format_progress(progress), flush=True)
+    try:
+        if args.dry_run:
+            report = generator.preflight(status_callback)
+            return 0 if report is not None and report.ok else 1
+        return generator.generate_and_merge(status_callback, merge=not args.no_merge)
+    except KeyboardInterrupt:
+        print("已中断", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"操作出错: {str(e)}", file=sys.stderr)
+        return 1
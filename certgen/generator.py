@@ -0,0 +1,1299 @@
+import os
+import time
+import json
+import hashlib
+from io import BytesIO
+from collections import deque
+from itertools import chain
+
+from .template import PlaceholderMatcher, CompiledTemplate, iter_document_paragraphs
+from .merger import FastMerger, StreamingMerger, header_footer_varies
+from .media import MEDIA_COMPRESSIONS, save_document, serialize_document, write_members, deduplicate_media
+from .pipeline import RenderPipeline, MergeStage
+from .xmlengine import XmlTemplate
+from .pdf import PdfConverter
+from .progress import ProgressReporter
+from .profiling import Instrumentation, TraceRecorder
+from .validation import PreflightReport
+from .sources import open_row_source
+
+# 兼容合并用分页符连接各证书，全部证书同在一节，只能有一份页眉页脚
+HEADER_FOOTER_NOTICE = "页眉页脚含占位符，兼容合并只能保留第一个证书的页眉页脚，改用快速合并（每个证书单独分节）"
+
+# 子进程内缓存的生成器（每个进程只编译一次模板）
+_worker_generators = {}
+
+def _render_rows_worker(template_file, replacement_config, output_dir, filename_fields, rows, collect_timings=False,
+                        media_compression="deflate", disk_cache=None, render_engine="docx"):
+    """进程池任务：在子进程中渲染一批数据行，返回 (render_row 的结果列表, 阶段耗时记录)"""
+    # 不以输出目录为键：共用进程池的多个任务使用同一模板时，子进程内的编译结果可以复用
+    key = (template_file, json.dumps(replacement_config, ensure_ascii=False, sort_keys=True), media_compression,
+           render_engine)
+    generator = _worker_generators.get(key)
+    if generator is None:
+        generator = DocumentGenerator(None, template_file, output_dir, None, replacement_config,
+                                      media_compression=media_compression, disk_cache=disk_cache,
+                                      render_engine=render_engine)
+        generator.compile_template()
+        generator.prepare_xml_template()
+        _worker_generators[key] = generator
+    generator.output_dir = output_dir
+    # 子进程的耗时记录随结果带回主进程
+    generator.instrumentation = TraceRecorder() if collect_timings else Instrumentation()
+    results = [generator.render_row(generator.compiled_template, index, item, filename_fields, reuse)
+               for index, item, reuse in rows]
+    return results, getattr(generator.instrumentation, "records", [])
+
+
+def _merge_volume_worker(output_dir, docx_paths, volume_path, merge_engine):
+    """进程池任务：把一卷证书合并为一个文件，返回 (分卷路径, 是否成功, 状态信息, 追加失败的证书数)
+
+    出错时只有本卷失败，不抛出异常，其他卷照常完成并记入断点日志。
+    """
+    messages = []
+    generator = DocumentGenerator(None, None, output_dir, volume_path, [], merge_engine=merge_engine)
+    generator.progress.callback = lambda progress: None # 分卷内不逐个输出“已合并”
+    generator.generated_files = list(docx_paths)
+    try:
+        result = generator.merge_docx(messages.append)
+    except Exception as e:
+        return volume_path, False, messages + [f"合并出错：{str(e)}"], generator.merge_fail_count
+    return volume_path, bool(result), messages, generator.merge_fail_count
+
+
+class DocumentGenerator:
+    chunk_size = 20 # 并行模式下每个任务包含的数据行数
+    manifest_name = ".certmaker_manifest.json" # 增量生成清单，保存在输出目录中
+    manifest_version = 1
+    journal_name = ".certmaker_journal.jsonl" # 断点日志，保存在输出目录中，全部成功后删除
+    checkpoint_every = 100 # 每完成多少行写一次断点
+    save_threads = 2 # 流水线模式下的保存线程数
+
+    merge_engines = ("fast", "composer", "stream") # 快速合并（同模板） / docxcompose 兼容合并 / 流式合并（内存恒定）
+    pdf_modes = ("merged", "each") # PDF导出：转换合并文件 / 转换每个证书
+    media_compressions = tuple(MEDIA_COMPRESSIONS) # 单个证书中图片的压缩方式：默认 / 最快 / 不压缩
+    render_engines = ("docx", "xml") # 渲染单个证书：python-docx 对象模型 / 直接拼接XML字节
+
+    def __init__(self, database, template, doc_output, merge_output, replacement_config, workers=1,
+                 direct_merge=False, merge_engine="composer", stream_rows=False, incremental=False,
+                 progress_callback=None, progress_interval=0.2, instrumentation=None, volume_size=0,
+                 pdf_mode=None, soffice=None, resume=False, media_compression="deflate", sheet=None,
+                 executor=None, template_cache=None, pipeline=False, queue_size=32, disk_cache=None,
+                 render_engine="docx", query=None, pdf_timeout=None):
+        self.excel_file = database # 数据库文件：Excel、CSV 或 SQLite，按扩展名区分
+        self.sheet = sheet # 工作表名（SQLite 为表名），None 时读取活动工作表
+        self.query = query # SQLite 数据库的自定义查询，指定后忽略 sheet
+        self.template_file = template
+        self.output_dir = doc_output
+        self.merge_output = merge_output
+        self.replacement_config = replacement_config
+        self.matcher = PlaceholderMatcher(replacement_config) # 预编译的占位符匹配器
+        self.workers = max(1, workers or 1) # 并行进程数，1 表示串行
+        self.direct_merge = direct_merge # True 时跳过单个证书文件，直接生成合并文件
+        self.merge_engine = merge_engine # 合并方式，见 merge_engines
+        self.stream_rows = stream_rows # True 时边读数据边生成，不预先载入整张表
+        self.incremental = incremental # True 时只重建内容有变化的证书
+        # 进度通道：设置回调后逐行提示不再输出，改为按固定间隔上报汇总进度（错误信息仍逐条输出）
+        self.progress = ProgressReporter(progress_callback, progress_interval)
+        # 分阶段插桩，默认不记录；传入 TraceRecorder 可导出逐行耗时
+        self.instrumentation = instrumentation or Instrumentation()
+        self.volume_size = volume_size # 每卷证书数，大于 0 时合并结果拆分为多个分卷文件
+        self.merge_outputs = [] # 实际写出的合并文件（分卷时为多个）
+        self.pdf_mode = pdf_mode # 生成后导出PDF，见 pdf_modes；None 表示不导出
+        self.soffice = soffice # LibreOffice 可执行文件路径，None 时自动查找
+        self.pdf_timeout = pdf_timeout # 每批PDF转换的超时秒数，None 时按文件大小自动计算，0 表示不限时
+        self.pdf_files = [] # 已导出的PDF文件
+        self.resume = resume # True 时根据断点日志跳过上次已完成的行和分卷
+        self.journal = None # 续做时读取到的断点日志
+        self.journal_active = False # 本次运行是否在写断点日志
+        self.media_compression = media_compression # 保存单个证书时图片部件的压缩方式，见 media_compressions
+        self.fail_count = 0 # 生成失败的行数
+        self.merge_fail_count = 0 # 合并时追加失败的证书数
+        self.read_failed = False # 流式读取中途出错，数据没有全部读取
+        self.generated_files = [] # 已生成的Word文件列表
+        self.compiled_template = None # 预编译模板（整批只解析一次）
+        self.render_engine = render_engine # 单个证书的渲染方式，见 render_engines
+        self.xml_template = None # XML 引擎的字节模板，由 prepare_xml_template 生成
+        # 批量任务共用的进程池和模板缓存（见 jobs.JobRunner）；未传入时各自创建
+        self.executor = executor
+        self.template_cache = template_cache
+        self.disk_cache = disk_cache # 磁盘上的预编译模板缓存（cache.TemplateCache），跨运行复用；None 时不使用
+        # 流水线：读取、渲染、保存、合并同时进行；queue_size 为各阶段之间最多排队的证书数，限制内存占用
+        self.pipeline = pipeline
+        self.queue_size = max(1, queue_size or 1)
+        self.concurrent_merger = None # 与生成同时进行的合并所用的合并器
+        self.concurrent_merge_output = None # 与生成同时进行的合并写出的文件
+        self.merge_stage = None # 与生成同时进行的合并阶段（pipeline.MergeStage）
+        self.merge_deferred = False # 文件名有重复、同时合并改为生成后合并
+        
+        # 确保输出目录存在
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+
+    def get_row_source(self):
+        """按数据库文件的扩展名选择数据来源（Excel / CSV / SQLite），见 sources.open_row_source"""
+        return open_row_source(self.excel_file, self.sheet, self.query)
+
+    def iter_sheet_rows(self, status_callback):
+        """流式读取：表头列号只解析一次，逐行产出 (行号, 数据行, 为空的必填字段)
+
+        各种数据来源共用这里的表头校验和必填检查；行号与表格中一致，表头为第1行。
+        """
+        source = self.get_row_source()
+        rows = source.iter_rows()
+        try:
+            headers = [str(value).strip() if value else "" for value in next(rows, ())]
+            status_callback(f"成功加载数据库文件：{source.description}")
+
+            required_headers = [item["excel_header"] for item in self.replacement_config]
+            missing_headers = [h for h in required_headers if h not in headers]
+            if missing_headers:
+                raise ValueError(f"数据库缺少必要表头：{missing_headers}")
+
+            # 每个字段对应的列号只计算一次
+            columns = [(header, headers.index(header)) for header in dict.fromkeys(required_headers)]
+            required_fields = [cfg["excel_header"] for cfg in self.replacement_config if cfg.get("required", False)]
+
+            for row_num, row in enumerate(rows, start=2):
+                row_data = {}
+                for header, col_index in columns:
+                    cell_value = row[col_index] if col_index < len(row) else ""
+                    row_data[header] = str(cell_value).strip() if cell_value else ""
+                yield row_num, row_data, [field for field in required_fields if not row_data[field]]
+        finally:
+            rows.close()
+
+    def iter_excel_rows(self, status_callback):
+        """逐行产出校验通过的数据，必填字段为空的行提示后跳过"""
+        for row_num, row_data, required_empty in self.iter_sheet_rows(status_callback):
+            if required_empty:
+                status_callback(f"跳过不完整数据行（第{row_num}行）：必填字段{required_empty}为空")
+            else:
+                yield row_data
+
+    def iter_excel_data(self, status_callback):
+        """在 iter_excel_rows 外包一层错误处理和统计，出错时提示并结束，同时设置 read_failed"""
+        excel_start = time.perf_counter()
+        count = 0
+        self.read_failed = False
+        try:
+            for row_data in self.iter_excel_rows(status_callback):
+                count += 1
+                yield row_data
+            excel_end = time.perf_counter()
+            status_callback(f"成功读取 {count} 条数据（耗时：{excel_end - excel_start:.2f}秒）")
+        except FileNotFoundError:
+            self.read_failed = True
+            status_callback(f"错误：未找到数据库文件「{self.excel_file}」")
+        except Exception as e:
+            self.read_failed = True
+            status_callback(f"读取数据库错误：{str(e)}")
+
+    def read_excel_data(self, status_callback):
+        try:
+            excel_start = time.perf_counter()
+            data = list(self.iter_excel_rows(status_callback))
+            excel_end = time.perf_counter()
+            status_callback(f"成功读取 {len(data)} 条数据（耗时：{excel_end - excel_start:.2f}秒）")
+            return data
+
+        except FileNotFoundError:
+            status_callback(f"错误：未找到数据库文件「{self.excel_file}」")
+            return []
+        except Exception as e:
+            status_callback(f"读取数据库错误：{str(e)}")
+            return []
+
+    def load_rows(self, status_callback):
+        """按读取模式返回 (数据行, 总数)；流式读取时总数未知，为 None"""
+        if not self.stream_rows:
+            data = self.read_excel_data(status_callback)
+            return data, len(data)
+
+        rows = self.iter_excel_data(status_callback)
+        first_row = next(rows, None)
+        if first_row is None:
+            return [], 0
+        return chain([first_row], rows), None
+
+    def replace_placeholder_in_run(self, run_text, row_data, values=None):
+        if not run_text:
+            return run_text
+        
+        # 核心逻辑：空值删除占位符，非空按格式替换（每行的替换值只计算一次）
+        if values is None:
+            values = self.matcher.row_values(row_data)
+        return self.matcher.substitute(run_text, values)
+
+    def process_paragraph(self, paragraph, row_data, values=None):
+        if not paragraph.text.strip():
+            return
+        
+        if values is None:
+            values = self.matcher.row_values(row_data)
+        # Word 常把占位符拆成多个run，先归并到首个run
+        self.matcher.join_split_runs(paragraph)
+        for run in paragraph.runs:
+            original_run_text = run.text
+            if not original_run_text:
+                continue
+            
+            # 检查是否包含任意占位符
+            if not self.matcher.search(original_run_text):
+                continue
+            
+            # 替换/删除占位符（保留格式）
+            new_run_text = self.replace_placeholder_in_run(original_run_text, row_data, values)
+            if new_run_text != original_run_text:
+                run.text = new_run_text
+
+    def replace_placeholders(self, doc, row_data):
+        values = self.matcher.row_values(row_data)
+        # 正文、表格（含嵌套）、文本框、页眉页脚中的段落各处理一次
+        for para in iter_document_paragraphs(doc):
+            self.process_paragraph(para, row_data, values)
+
+    def clean_filename(self, filename):
+        """清理文件名中的非法字符"""
+        invalid_chars = '/\\:*?"<>|' # Windows系统非法字符
+        for char in invalid_chars:
+            filename = filename.replace(char, '_') # 用下划线替换非法字符
+        # 额外处理首尾空格/换行，避免文件名异常
+        filename = filename.strip()
+        return filename
+
+    def compile_template(self):
+        """解析模板并记录占位符位置，整批复用；有共用缓存时同一模板和配置只解析一次"""
+        key = (os.path.abspath(self.template_file),
+               json.dumps(self.replacement_config, ensure_ascii=False, sort_keys=True))
+        if self.template_cache is not None and key in self.template_cache:
+            self.compiled_template = self.template_cache[key]
+            return self.compiled_template
+        with self.instrumentation.stage("load_template"):
+            self.compiled_template = self.load_compiled_template()
+        if self.template_cache is not None:
+            self.template_cache[key] = self.compiled_template
+        return self.compiled_template
+
+    def prepare_xml_template(self, status_callback=None):
+        """XML 引擎：把预编译模板切分为字节模板；模板结构不支持时提示并改用 python-docx 渲染"""
+        self.xml_template = None
+        if self.render_engine != "xml":
+            return
+        try:
+            with self.instrumentation.stage("load_template", None, "xml"):
+                self.xml_template = XmlTemplate(self.compiled_template, self.media_compression)
+        except ValueError as e:
+            if status_callback is not None:
+                status_callback(f"XML引擎不适用于此模板（{str(e)}），改用 python-docx 渲染")
+
+    def load_compiled_template(self):
+        """解析模板；启用磁盘缓存时先查缓存，未命中时解析后写入缓存"""
+        if self.disk_cache is None:
+            return CompiledTemplate(self.template_file, self.matcher)
+        key = self.disk_cache.get_key(self.hash_file(self.template_file), self.replacement_config)
+        template = self.disk_cache.load(key, self.template_file, self.matcher)
+        if template is None:
+            template = CompiledTemplate(self.template_file, self.matcher)
+            try:
+                self.disk_cache.store(key, template)
+            except OSError:
+                pass # 缓存目录不可写时照常生成
+        return template
+
+    def build_raw_filename(self, item, filename_fields):
+        """根据命名字段拼接文件名（未清理非法字符）"""
+        filename_parts = [str(item[field]) for field in filename_fields if item[field]]
+        return "_".join(filename_parts) + ".docx"
+
+    def build_filename(self, item, filename_fields):
+        """根据命名字段生成证书文件名"""
+        return self.clean_filename(self.build_raw_filename(item, filename_fields))  # 清理非法字符
+
+    def preflight(self, status_callback):
+        """预检（dry-run）：读取整张表并检查模板，不生成任何文件；出错时返回 None，否则返回 PreflightReport"""
+        preflight_start = time.perf_counter()
+        report = PreflightReport()
+        filename_fields = self.get_filename_fields()
+        try:
+            report.check_template(self.matcher, self.compile_template().found_placeholders)
+            for row_num, row_data, required_empty in self.iter_sheet_rows(status_callback):
+                raw_filename = self.build_raw_filename(row_data, filename_fields)
+                report.add_row(row_num, required_empty, raw_filename, self.clean_filename(raw_filename))
+        except FileNotFoundError as e:
+            status_callback(f"错误：未找到文件「{e.filename}」")
+            return None
+        except Exception as e:
+            status_callback(f"预检出错：{str(e)}")
+            return None
+        for message in report.messages():
+            status_callback(message)
+        status_callback(f"预检耗时：{time.perf_counter() - preflight_start:.2f}秒")
+        return report
+
+    def warn_duplicate_filenames(self, data, filename_fields, status_callback):
+        """生成前提示会互相覆盖的重复文件名（数据已全部载入时才检查）"""
+        seen = {}
+        duplicates = []
+        for index, item in enumerate(data, start=1):
+            filename = self.build_filename(item, filename_fields)
+            key = filename.casefold()
+            if key in seen:
+                duplicates.append(f"{filename}（第{seen[key]}条与第{index}条）")
+            else:
+                seen[key] = index
+        if duplicates:
+            shown = "；".join(duplicates[:PreflightReport.max_listed])
+            status_callback(f"警告：{len(duplicates)} 个证书文件名重复，后生成的将覆盖先生成的：{shown}")
+
+    def row_error(self, label, e):
+        """单行出错时的提示信息"""
+        if "No such file or directory" in str(e) and "docx" in str(e):
+            return f"处理{label}时出错：文件名含非法字符，{str(e)}"
+        return f"处理{label}时出错：{str(e)}"
+
+    def save_file(self, file_path, write):
+        """write(路径) 先写入临时文件，写完后再替换为 file_path，其他进程或线程不会读到写了一半的证书"""
+        tmp_path = file_path + ".tmp"
+        try:
+            write(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, file_path)
+
+    def render_row(self, template, index, item, filename_fields, reuse=False):
+        """渲染并保存一行数据，返回 (序号, 文件名, 文件路径, 错误信息, 是否沿用旧文件)"""
+        filename = None
+        stage = self.instrumentation.stage
+        try:
+            # 生成文件名
+            with stage("filename", index):
+                filename = self.build_filename(item, filename_fields)
+                file_path = os.path.join(self.output_dir, filename)
+            if reuse:
+                return index, filename, file_path, None, True
+            if self.xml_template is not None:
+                with stage("substitute", index, filename):
+                    blobs = self.xml_template.render(item)
+                with stage("save", index, filename):
+                    self.save_file(file_path, lambda path: self.xml_template.write(path, blobs))
+                return index, filename, file_path, None, False
+            with stage("substitute", index, filename):
+                saved_children = template.apply(item)
+            try:
+                with stage("save", index, filename):
+                    self.save_file(file_path,
+                                   lambda path: save_document(template.document, path, self.media_compression))
+            finally:
+                template.restore(saved_children)
+            return index, filename, file_path, None, False
+        except Exception as e:
+            return index, filename, None, self.row_error(item.get(filename_fields[0], ''), e), False
+
+    def render_row_members(self, template, index, item, filename_fields, reuse=False):
+        """流水线的渲染阶段：替换后把文档序列化到内存，返回 (render_row 格式的结果, 待保存的数据)
+
+        压缩和写盘由 save_row_members 在保存线程中完成；沿用旧文件或出错时待保存的数据为 None。
+        """
+        filename = None
+        stage = self.instrumentation.stage
+        label = item.get(filename_fields[0], '')
+        try:
+            with stage("filename", index):
+                filename = self.build_filename(item, filename_fields)
+                file_path = os.path.join(self.output_dir, filename)
+            if reuse:
+                return (index, filename, file_path, None, True), None
+            if self.xml_template is not None:
+                with stage("substitute", index, filename):
+                    return (index, filename, file_path, None, False), (self.xml_template.render(item), label)
+            with stage("substitute", index, filename):
+                saved_children = template.apply(item)
+            try:
+                with stage("serialize", index, filename):
+                    members = serialize_document(template.document)
+            finally:
+                template.restore(saved_children)
+            return (index, filename, file_path, None, False), (members, label)
+        except Exception as e:
+            return (index, filename, None, self.row_error(label, e), False), None
+
+    def save_row_members(self, result, payload):
+        """流水线的保存阶段：把序列化好的部件写为证书文件"""
+        index, filename, file_path, _, _ = result
+        members, label = payload
+        try:
+            with self.instrumentation.stage("save", index, filename):
+                if self.xml_template is not None:
+                    self.save_file(file_path, lambda path: self.xml_template.write(path, members))
+                else:
+                    self.save_file(file_path, lambda path: write_members(path, members, self.media_compression))
+            return result
+        except Exception as e:
+            return index, filename, None, self.row_error(label, e), False
+
+    def iter_pipeline_results(self, template, tasks, filename_fields, on_duplicate=None):
+        """流水线模式：按数据库顺序产出结果，读取、渲染、保存在不同线程中同时进行
+
+        与 iter_parallel_results 一样按段进行，同名的行不会由两个保存线程同时写入。
+        """
+        for segment in self.iter_task_segments(tasks, filename_fields, on_duplicate):
+            pipeline = RenderPipeline(lambda task: self.render_row_members(template, task[0], task[1],
+                                                                           filename_fields, task[2]),
+                                      self.save_row_members, self.queue_size, self.save_threads)
+            yield from pipeline.run(segment)
+
+    def filename_key(self, item, filename_fields):
+        """判断文件名是否重复所用的键（不区分大小写）；文件名出错时返回 None，由渲染时报告"""
+        try:
+            return self.build_filename(item, filename_fields).casefold()
+        except Exception:
+            return None
+
+    def iter_task_segments(self, tasks, filename_fields, on_duplicate=None):
+        """把任务切成若干段，段内的文件名互不相同：遇到与本段前面的行同名的任务时开始新的一段
+
+        每段是一个迭代器，须用完后再取下一段。前一段全部写完后才开始下一段，同名文件不会被同时写入。
+        开始第二段及以后的各段之前调用 on_duplicate。
+        """
+        tasks = iter(tasks)
+        carried = [] # 与上一段同名、留给下一段的第一个任务
+
+        def segment():
+            names = set()
+            while True:
+                task = carried.pop() if carried else next(tasks, None)
+                if task is None:
+                    return
+                key = self.filename_key(task[1], filename_fields)
+                if key in names:
+                    carried.append(task)
+                    return
+                if key is not None:
+                    names.add(key)
+                yield task
+
+        first = True
+        while True:
+            if not carried:
+                task = next(tasks, None)
+                if task is None:
+                    return
+                carried.append(task)
+            if not first and on_duplicate is not None:
+                on_duplicate()
+            first = False
+            yield segment()
+
+    def submit_rows(self, executor, filename_fields, rows):
+        return executor.submit(_render_rows_worker, self.template_file, self.replacement_config, self.output_dir,
+                               filename_fields, rows, self.instrumentation.enabled, self.media_compression,
+                               self.disk_cache, self.render_engine)
+
+    def iter_parallel_results(self, tasks, filename_fields, on_duplicate=None):
+        """按数据库顺序产出进程池的渲染结果，同时在途的任务数量有上限
+
+        同名的行分在不同的段中（见 iter_task_segments），前一段的任务全部完成后才提交下一段，
+        同一文件不会被两个进程同时写入，最终内容与串行生成一致（后面的行覆盖前面的行）。
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        executor = self.executor or ProcessPoolExecutor(max_workers=self.workers)
+        pending = deque()
+        try:
+            for segment in self.iter_task_segments(tasks, filename_fields, on_duplicate):
+                chunk = []
+                for task in segment:
+                    chunk.append(task)
+                    if len(chunk) < self.chunk_size:
+                        continue
+                    pending.append(self.submit_rows(executor, filename_fields, chunk))
+                    chunk = []
+                    # 先取回最早提交的任务，保证结果顺序且内存有界
+                    while len(pending) >= self.workers * 2:
+                        yield from self.collect_worker_results(pending.popleft())
+                if chunk:
+                    pending.append(self.submit_rows(executor, filename_fields, chunk))
+                while pending:
+                    yield from self.collect_worker_results(pending.popleft())
+        finally:
+            if self.executor is None:
+                executor.shutdown()
+            else:
+                # 共用的进程池留给后续任务，只取消本任务尚未开始的部分
+                for future in pending:
+                    future.cancel()
+
+    def collect_worker_results(self, future):
+        results, records = future.result()
+        self.instrumentation.add_records(records)
+        return results
+
+    def hash_file(self, path):
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def get_manifest_path(self):
+        return os.path.join(self.output_dir, self.manifest_name)
+
+    def load_manifest(self):
+        """读取增量生成清单，不存在或版本不符时返回 None"""
+        try:
+            with open(self.get_manifest_path(), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != self.manifest_version:
+            return None
+        return manifest
+
+    def save_manifest(self, files):
+        manifest = {
+            "version": self.manifest_version,
+            "template_hash": self.template_hash,
+            "config_hash": self.config_hash,
+            "files": files,
+        }
+        tmp_path = self.get_manifest_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.get_manifest_path())
+
+    def compute_hashes(self):
+        """模板文件和替换配置的指纹，供增量清单和断点日志校验"""
+        self.template_hash = self.hash_file(self.template_file)
+        self.config_hash = hashlib.sha256(json.dumps(self.replacement_config, ensure_ascii=False,
+                                                     sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get_journal_path(self):
+        return os.path.join(self.output_dir, self.journal_name)
+
+    def journal_header(self):
+        """断点日志首行：数据库、模板和配置都未变化时才允许续做"""
+        self.compute_hashes()
+        return {"version": self.manifest_version, "database_hash": self.hash_file(self.excel_file),
+                "sheet": self.sheet, "query": self.query, "template_hash": self.template_hash, "config_hash": self.config_hash}
+
+    def load_journal(self):
+        """读取断点日志，返回 {"rows": {序号: 文件名}, "volumes": {分卷文件名: 指纹}, "size": 有效字节数}
+
+        首行与当前数据不符时返回 None；中断时写了一半的末行会被忽略。
+        """
+        try:
+            with open(self.get_journal_path(), "rb") as f:
+                lines = f.read().split(b"\n")[:-1] # 最后一段没有换行，视为未写完
+        except OSError:
+            return None
+        if not lines:
+            return None
+        try:
+            if json.loads(lines[0]) != self.journal_header():
+                return None
+        except ValueError:
+            return None
+
+        journal = {"rows": {}, "volumes": {}, "size": len(lines[0]) + 1}
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if "row" in entry:
+                journal["rows"][entry["row"]] = entry["file"]
+            elif "volume" in entry:
+                journal["volumes"][entry["volume"]] = entry["digest"]
+            journal["size"] += len(line) + 1
+        return journal
+
+    def start_journal(self):
+        """开始写断点日志：续做时截掉不完整的末行后追加，否则新建"""
+        if self.journal is not None:
+            with open(self.get_journal_path(), "r+b") as f:
+                f.truncate(self.journal["size"])
+        else:
+            tmp_path = self.get_journal_path() + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self.journal_header(), ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.get_journal_path())
+        self.journal_active = True
+
+    def append_journal(self, entries, status_callback):
+        """追加断点记录并落盘；写入失败（如磁盘已满）时提示并停止记录，生成照常进行
+
+        未记下的行在续做时会重新生成，断点日志缺少末尾几行不影响正确性。
+        """
+        if not self.journal_active or not entries:
+            return
+        try:
+            with open(self.get_journal_path(), "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            self.journal_active = False
+            status_callback(f"写入断点记录出错：{str(e)}，本次不再记录断点")
+
+    def prepare_resume(self, status_callback):
+        """续做模式下读取断点日志，可以续做时返回 True（此时不清理输出目录）"""
+        self.journal = None
+        if not self.resume:
+            return False
+        journal = self.load_journal()
+        if journal is None:
+            status_callback("未找到可用的断点记录（或数据库、模板、配置已变化），将重新生成")
+            return False
+        self.journal = journal
+        status_callback(f"断点续做：上次已完成 {len(journal['rows'])} 行、{len(journal['volumes'])} 卷，从断点继续")
+        return True
+
+    def row_digest(self, item):
+        """行内容指纹：模板哈希 + 配置哈希 + 本行各字段的值"""
+        values = [item.get(cfg["excel_header"], "") for cfg in self.replacement_config]
+        key = json.dumps([self.template_hash, self.config_hash, values], ensure_ascii=False)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def iter_render_tasks(self, data, filename_fields, old_files, new_files):
+        """产出 (序号, 数据行, 是否沿用旧文件)；增量模式下对比清单、续做时对比断点日志决定是否需要重建"""
+        done_rows = self.journal["rows"] if self.journal else {}
+        claimed = set() # 本次运行中前面的行已产出的文件名（不区分大小写）
+        for index, item in enumerate(data, start=1):
+            if old_files is None and not done_rows:
+                yield index, item, False
+                continue
+            filename = self.build_filename(item, filename_fields)
+            # 文件名与前面的行重复时，磁盘上的文件可能刚被前面的行重建，不能沿用，与全量生成的结果保持一致
+            key = filename.casefold()
+            exists = key not in claimed and os.path.exists(os.path.join(self.output_dir, filename))
+            claimed.add(key)
+            reuse = exists and done_rows.get(index) == filename
+            if old_files is not None:
+                digest = self.row_digest(item)
+                reuse = reuse or (exists and old_files.get(filename) == digest)
+                new_files[filename] = digest
+            yield index, item, reuse
+
+    def remove_stale_files(self, old_files, new_files, status_callback):
+        """删除清单中已不再对应任何数据行的旧证书"""
+        for filename in old_files:
+            if filename in new_files:
+                continue
+            file_path = os.path.join(self.output_dir, filename)
+            if os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    status_callback(f"已删除过期证书: {filename}")
+                except Exception as e:
+                    status_callback(f"删除{filename}失败: {str(e)}")
+
+    def clean_output_dir(self, status_callback):
+        """生成证书前先清理输出目录中的Word文件（增量模式下由清单决定删除哪些文件）"""
+        if self.incremental and self.load_manifest() is not None:
+            status_callback("增量生成：根据清单只重建有变化的证书")
+            return
+
+        status_callback("清理输出目录中的原有Word文件...")
+        if os.path.exists(self.output_dir):
+            for filename in os.listdir(self.output_dir):
+                if filename.endswith(".docx") and not filename.startswith("~$"):
+                    file_path = os.path.join(self.output_dir, filename)
+                    try:
+                        os.remove(file_path)
+                        status_callback(f"已删除: {filename}")
+                    except Exception as e:
+                        status_callback(f"删除{filename}失败: {str(e)}")
+
+    def generate_and_merge(self, status_callback, merge=True):
+        """完整流程：生成证书并自动合并（merge=False 时只生成）
+
+        全部成功返回 0；有任何一行生成失败或合并失败时返回 1（其余证书照常生成、合并和导出）。
+        """
+        self.instrumentation.start_run()
+        self.fail_count = 0
+        self.merge_fail_count = 0
+        try:
+            if self.direct_merge:
+                # 直接合并模式：不落地单个证书，渲染后直接追加到合并文件
+                if not self.generate_merged_document(status_callback):
+                    return 1
+            else:
+                # 续做时保留上次已生成的证书，否则先清理输出目录
+                if not self.prepare_resume(status_callback):
+                    self.clean_output_dir(status_callback)
+                self.start_journal()
+
+                # 生成证书（流水线模式下同模板合并与生成同时进行）
+                concurrent_merge = merge and self.can_merge_concurrently()
+                result = self.generate_documents(status_callback, concurrent_merge=concurrent_merge)
+                if result != 0:
+                    return result
+
+                # 自动合并证书（文件名有重复时同时合并已放弃，见 defer_concurrent_merge）
+                if concurrent_merge and not self.merge_deferred:
+                    if not self.concurrent_merge_output:
+                        return 1
+                elif merge:
+                    status_callback("\n开始自动合并证书...")
+                    if not self.merge_docx(status_callback):
+                        return 1
+
+                # 全部成功后不再需要断点；有失败行时保留，续做时只重试失败的行
+                self.journal_active = False
+                if self.fail_count == 0:
+                    os.remove(self.get_journal_path())
+
+            pdf_ok = True
+            if self.pdf_mode:
+                status_callback("\n开始导出PDF...")
+                pdf_ok = self.export_pdf(status_callback)
+            failed = self.fail_count + self.merge_fail_count
+            if failed:
+                status_callback(f"\n❌ 有 {failed} 个证书生成或合并失败，详见上方信息")
+            return 0 if pdf_ok and not failed else 1
+        finally:
+            self.journal_active = False
+            self.instrumentation.finish_run()
+
+    def report_row(self, status_callback, message, ok=True):
+        """记录一行结果：计入进度；未接入进度通道时保持逐行输出，失败信息始终输出"""
+        self.progress.advance(ok)
+        if not ok or self.progress.callback is None:
+            status_callback(message)
+
+    def generate_documents(self, status_callback, concurrent_merge=False):
+        """生成全部单个证书；concurrent_merge=True 时每个证书保存后立即交给合并线程追加"""
+        total_start = time.perf_counter()
+        data, total = self.load_rows(status_callback)
+        
+        if total == 0:
+            status_callback("\n❌ 无有效数据，无法生成证书")
+            return 1
+        
+        # 清空之前的记录
+        self.generated_files = []
+
+        success_count = 0
+        fail_count = 0
+        self.fail_count = 0
+        
+        # 获取文件名字段
+        filename_fields = self.get_filename_fields()
+        if total is not None:
+            self.warn_duplicate_filenames(data, filename_fields, status_callback)
+
+        # 增量模式：读取上次的清单，只重建有变化的行
+        old_files = None
+        new_files = {}
+        if self.incremental:
+            manifest = self.load_manifest() or {}
+            old_files = manifest.get("files", {})
+            self.compute_hashes()
+        elif os.path.exists(self.get_manifest_path()):
+            # 全量生成后旧清单已失效
+            os.remove(self.get_manifest_path())
+        tasks = self.iter_render_tasks(data, filename_fields, old_files, new_files)
+        reused_count = 0
+        done_rows = self.journal["rows"] if self.journal else {}
+        checkpoint = [] # 尚未写入断点日志的已完成行
+        self.concurrent_merge_output = None
+        self.merge_stage = None
+        self.merge_deferred = False
+        on_duplicate = None
+        if concurrent_merge:
+            self.concurrent_merger = None
+            self.merge_stage = MergeStage(lambda path: self.append_concurrently(path, status_callback),
+                                          self.queue_size)
+            on_duplicate = lambda: self.defer_concurrent_merge(status_callback)
+            status_callback("流水线：合并与生成同时进行")
+        completed = False
+        self.progress.start("生成", total)
+
+        try:
+            if self.workers > 1:
+                status_callback(f"并行生成：{self.workers} 个进程")
+                results = self.iter_parallel_results(tasks, filename_fields, on_duplicate)
+            else:
+                # 模板只加载一次，之后每行只修改记录下来的run（XML 引擎只替换字节模板中的插槽）
+                try:
+                    template = self.compile_template()
+                except Exception as e:
+                    status_callback(f"加载模板出错：{str(e)}")
+                    return 1
+                self.prepare_xml_template(status_callback)
+                if self.pipeline:
+                    status_callback(f"流水线生成：{self.save_threads} 个保存线程，队列上限 {self.queue_size}")
+                    results = self.iter_pipeline_results(template, tasks, filename_fields, on_duplicate)
+                else:
+                    results = (self.render_row(template, index, item, filename_fields, reuse)
+                               for index, item, reuse in tasks)
+
+            for index, filename, file_path, error, reused in results:
+                if error:
+                    fail_count += 1
+                    self.report_row(status_callback, error, ok=False)
+                    new_files.pop(filename, None)
+                    continue
+
+                # 记录生成的文件路径（按数据库顺序）
+                self.generated_files.append(file_path)
+                if self.merge_stage is not None:
+                    self.merge_stage.put(file_path)
+                if done_rows.get(index) != filename:
+                    checkpoint.append({"row": index, "file": filename})
+                    if len(checkpoint) >= self.checkpoint_every:
+                        self.append_journal(checkpoint, status_callback)
+                        checkpoint = []
+
+                success_count += 1
+                progress = f"{index}/{total}" if total else f"{index}"
+                if reused:
+                    reused_count += 1
+                    self.report_row(status_callback, f"未变化，沿用：{filename}（{progress}）")
+                else:
+                    self.report_row(status_callback, f"已生成：{filename}（{progress}）")
+            if self.read_failed:
+                # 流式读取中途出错：已生成的证书保留并记入断点日志，但数据不完整，不合并
+                status_callback(f"\n❌ 数据没有全部读取，已生成 {success_count} 个证书，未合并")
+                return 1
+            completed = True
+        except Exception as e:
+            # 单行的错误已在结果中逐行报告，这里是读取数据、进程池等使整批生成中断的错误
+            status_callback(f"生成出错：{str(e)}")
+            return 1
+        finally:
+            self.fail_count = fail_count
+            self.append_journal(checkpoint, status_callback)
+            if self.merge_stage is not None and not completed:
+                self.finish_concurrent_merge(self.merge_stage, status_callback, ok=False)
+        self.progress.finish()
+
+        if self.incremental:
+            self.remove_stale_files(old_files, new_files, status_callback)
+            self.save_manifest(new_files)
+            status_callback(f"增量生成：重建 {success_count - reused_count} 个，沿用 {reused_count} 个")
+        
+        # 输出汇总
+        total = success_count + fail_count
+        total_end = time.perf_counter()
+        total_elapsed = total_end - total_start
+        status_callback(f"生成完成：{success_count}/{success_count + fail_count}")
+        status_callback(f"总耗时长：{total_elapsed:.2f}秒（平均：{total_elapsed/total:.2f}个/秒）" if total else f"总耗时长：{total_elapsed:.2f}秒")
+        status_callback(f"保存路径：{os.path.abspath(self.output_dir)}")
+
+        if self.merge_stage is not None:
+            self.concurrent_merge_output = self.finish_concurrent_merge(self.merge_stage, status_callback,
+                                                                        ok=success_count > 0)
+        return 0 if success_count > 0 else 1
+
+    def can_merge_concurrently(self):
+        """流水线模式下同模板合并（fast/stream）与生成同时进行；分卷合并和兼容合并仍在生成后进行"""
+        return self.pipeline and not self.volume_size and self.merge_engine in ("fast", "stream")
+
+    def defer_concurrent_merge(self, status_callback):
+        """文件名有重复时放弃同时合并，生成完成后再统一合并
+
+        同时合并读到的是每行当时写出的证书，生成后合并读到的是被后面同名的行覆盖后的证书；
+        改为生成后合并，结果与其他模式一致，合并线程也不会读到正被覆盖的文件。
+        """
+        if self.merge_deferred:
+            return
+        status_callback("证书文件名有重复，改为生成完成后再合并")
+        self.finish_concurrent_merge(self.merge_stage, status_callback, ok=False)
+        self.merge_stage = None
+        self.merge_deferred = True
+        self.merge_fail_count = 0 # 生成后会重新合并全部证书
+
+    def append_concurrently(self, path, status_callback):
+        """在合并线程中调用：第一个证书作为合并的基础，之后逐个追加"""
+        if self.concurrent_merger is None:
+            if self.merge_engine == "stream":
+                self.concurrent_merger = StreamingMerger(path, self.merge_output)
+            else:
+                from docx import Document
+                self.concurrent_merger = FastMerger(Document(path))
+            return
+        try:
+            with self.instrumentation.stage("merge_append", None, os.path.basename(path)):
+                self.concurrent_merger.append_file(path)
+        except Exception as e:
+            self.merge_fail_count += 1 # 只在合并线程中修改，合并线程结束后才读取
+            status_callback(f"合并 {os.path.basename(path)} 时出错：{str(e)}")
+
+    def finish_concurrent_merge(self, merge_stage, status_callback, ok):
+        """等待合并线程结束；ok 为 False（生成出错或中断）时放弃合并。成功返回合并文件路径"""
+        try:
+            merge_stage.close(cancel=not ok)
+        except Exception as e:
+            status_callback(f"合并出错：{str(e)}")
+            ok = False
+        merger, self.concurrent_merger = self.concurrent_merger, None
+        if not ok or merger is None:
+            if isinstance(merger, StreamingMerger):
+                merger.abort()
+            return None
+
+        try:
+            if isinstance(merger, StreamingMerger):
+                merger.close()
+            else:
+                merger.save(self.merge_output)
+        except Exception as e:
+            status_callback(f"保存合并文件出错：{str(e)}")
+            return None
+        self.merge_outputs = [self.merge_output]
+        self.deduplicate_merged_media(self.merge_output, status_callback)
+        status_callback(f"\n合并完成！")
+        status_callback(f"保存路径：{os.path.abspath(self.merge_output)}")
+        return self.merge_output
+
+    def get_filename_fields(self):
+        """获取用于命名文件的字段，未勾选时使用第一个字段"""
+        filename_fields = [cfg["excel_header"] for cfg in self.replacement_config if cfg.get("use_in_filename", False)]
+        if not filename_fields:
+            filename_fields = [self.replacement_config[0]["excel_header"]]
+        return filename_fields
+
+    def generate_merged_document(self, status_callback):
+        """直接合并模式：每行渲染后直接追加到合并文档，不写出也不回读单个证书"""
+        total_start = time.perf_counter()
+        data, total = self.load_rows(status_callback)
+
+        if total == 0:
+            status_callback("\n❌ 无有效数据，无法生成证书")
+            return None
+
+        self.generated_files = []
+        filename_fields = self.get_filename_fields()
+        success_count = 0
+
+        try:
+            template = self.compile_template()
+        except Exception as e:
+            status_callback(f"加载模板出错：{str(e)}")
+            return None
+
+        status_callback(f"开始直接合并 {total} 个证书..." if total else "开始直接合并证书...")
+        self.progress.start("生成并合并", total)
+        # 第一个渲染成功的证书作为合并的基础，此前出错的行与其他行一样提示后跳过
+        # 所有证书来自同一模板，页边距和纸张大小与主文档一致，无需逐节修正
+        main_doc = merger = composer = None
+        started = False
+        index = 0
+        try:
+            for index, item in enumerate(data, start=1):
+                try:
+                    if not started:
+                        with self.instrumentation.stage("substitute", index):
+                            first = self.render_merge_base(template, item)
+                        try:
+                            main_doc, merger, composer = self.start_direct_merger(template, first, status_callback)
+                        except Exception as e:
+                            status_callback(f"创建合并文件出错：{str(e)}")
+                            return None
+                        started = True
+                    else:
+                        with self.instrumentation.stage("substitute", index):
+                            saved_children = template.apply(item)
+                        try:
+                            with self.instrumentation.stage("merge_append", index):
+                                if merger is not None:
+                                    merger.append_document(template.document)
+                                else:
+                                    main_doc.add_page_break()
+                                    composer.append(template.document)
+                        finally:
+                            template.restore(saved_children)
+                    success_count += 1
+                    self.report_row(status_callback, f"已合并 {index}/{total} 个证书" if total else f"已合并 {index} 个证书")
+                except Exception as e:
+                    self.fail_count += 1
+                    self.report_row(status_callback, f"处理{item.get(filename_fields[0], '')}时出错：{str(e)}", ok=False)
+            if self.read_failed:
+                # 流式读取中途出错，不写出缺少后面各行的合并文件
+                if isinstance(merger, StreamingMerger):
+                    merger.abort()
+                status_callback("\n❌ 数据没有全部读取，未生成合并文件")
+                return None
+            if isinstance(merger, StreamingMerger):
+                merger.close()
+        except BaseException:
+            if isinstance(merger, StreamingMerger):
+                merger.abort() # 流式合并中断时删除未完成的临时文件
+            raise
+
+        self.progress.finish()
+        if not started:
+            status_callback("\n❌ 所有数据行都处理失败，未生成合并文件")
+            return None
+        if main_doc is not None:
+            main_doc.save(self.merge_output)
+        self.deduplicate_merged_media(self.merge_output, status_callback)
+        total = total or index
+        total_elapsed = time.perf_counter() - total_start
+        status_callback(f"\n合并完成！{success_count}/{total}")
+        status_callback(f"总耗时长：{total_elapsed:.2f}秒")
+        status_callback(f"保存路径：{os.path.abspath(self.merge_output)}")
+        self.merge_outputs = [self.merge_output]
+        return self.merge_output
+
+    def render_merge_base(self, template, item):
+        """直接合并：渲染作为合并基础的第一个证书。流式合并只在内存中保存一份，作为共享部件的来源；
+        其他合并方式单独加载一份主文档，模板文档每行打补丁后复用"""
+        if self.merge_engine == "stream":
+            first_file = BytesIO()
+            with template.patched(item) as doc:
+                doc.save(first_file)
+            return first_file
+        from docx import Document
+        main_doc = Document(self.template_file)
+        self.replace_placeholders(main_doc, item)
+        return main_doc
+
+    def start_direct_merger(self, template, first, status_callback):
+        """以 render_merge_base 的结果创建合并器，返回 (主文档, 合并器, docxcompose合并器)"""
+        if self.merge_engine == "stream":
+            return None, StreamingMerger(first, self.merge_output), None
+        fast = self.merge_engine == "fast"
+        if not fast and template.header_footer_placeholders:
+            status_callback(HEADER_FOOTER_NOTICE)
+            fast = True
+        if fast:
+            return first, FastMerger(first), None
+        from docxcompose.composer import Composer
+        return first, None, Composer(first)
+
+    def merge_docx(self, status_callback):
+        docx_paths = self.generated_files.copy()
+        
+        # 如果没有记录，则回退到原有方式
+        if not docx_paths:
+            status_callback("警告：未找到生成记录，将按文件名排序合并（可能与数据库顺序不一致）")
+            for filename in os.listdir(self.output_dir):
+                if filename.endswith(".docx") and not filename.startswith("~$"):
+                    docx_paths.append(os.path.abspath(os.path.join(self.output_dir, filename)))
+            docx_paths.sort()
+        
+        if not docx_paths:
+            status_callback("错误：未找到有效docx文件！")
+            return None
+
+        if self.volume_size and len(docx_paths) > self.volume_size:
+            return self.merge_volumes(docx_paths, status_callback)
+        self.merge_outputs = [self.merge_output]
+
+        if self.merge_engine == "fast":
+            return self.merge_docx_fast(docx_paths, status_callback)
+        if self.merge_engine == "stream":
+            return self.merge_docx_stream(docx_paths, status_callback)
+        if header_footer_varies(docx_paths):
+            status_callback(HEADER_FOOTER_NOTICE)
+            return self.merge_docx_fast(docx_paths, status_callback)
+
+        from docx import Document
+        from docxcompose.composer import Composer
+        main_doc = Document(docx_paths[0])
+        composer = Composer(main_doc)
+        main_section = main_doc.sections[0]
+        main_margins = (main_section.left_margin, main_section.right_margin, main_section.top_margin, main_section.bottom_margin)
+        main_page_size = (main_section.page_width, main_section.page_height)
+
+        total_docs = len(docx_paths)
+        status_callback(f"开始合并 {total_docs} 个文档...")
+        self.progress.start("合并", total_docs)
+        self.progress.advance()
+        
+        for i, doc_path in enumerate(docx_paths[1:], 1):
+            try:
+                sub_doc = Document(doc_path)
+                for section in sub_doc.sections:
+                    section.left_margin, section.right_margin = main_margins[0], main_margins[1]
+                    section.top_margin, section.bottom_margin = main_margins[2], main_margins[3]
+                    section.page_width, section.page_height = main_page_size[0], main_page_size[1]
+
+                with self.instrumentation.stage("merge_append", i + 1, os.path.basename(doc_path)):
+                    main_doc.add_page_break()
+                    composer.append(sub_doc)
+                self.report_row(status_callback, f"已合并 {i+1}/{total_docs} 个文档")
+            except Exception as e:
+                self.merge_fail_count += 1
+                self.report_row(status_callback, f"合并 {os.path.basename(doc_path)} 时出错：{str(e)}", ok=False)
+
+        self.progress.finish()
+
+        composer.save(self.merge_output)
+        self.deduplicate_merged_media(self.merge_output, status_callback)
+        status_callback(f"\n合并完成！")
+        status_callback(f"保存路径：{os.path.abspath(self.merge_output)}")
+        return self.merge_output
+
+    def get_volume_path(self, number):
+        """分卷文件名：在合并文件名后加三位卷号，如 生成的证书_001.docx"""
+        base, ext = os.path.splitext(self.merge_output)
+        return f"{base}_{number:03d}{ext or '.docx'}"
+
+    def merge_volumes(self, docx_paths, status_callback):
+        """分卷合并：每 volume_size 个证书一卷，各卷在独立进程中同时合并，单卷内存有上限"""
+        merge_start = time.perf_counter()
+        volumes = [docx_paths[i:i + self.volume_size] for i in range(0, len(docx_paths), self.volume_size)]
+        volume_paths = [self.get_volume_path(number) for number in range(1, len(volumes) + 1)]
+        status_callback(f"开始分卷合并 {len(docx_paths)} 个文档：共 {len(volumes)} 卷，每卷最多 {self.volume_size} 个")
+        self.progress.start("分卷合并", len(volumes))
+
+        # 续做时跳过上次已合并、且所含证书未变的分卷
+        done_volumes = self.journal["volumes"] if self.journal else {}
+        digests = [self.volume_digest(volume) for volume in volumes]
+        finished = {}
+        tasks = []
+        for number, (volume, volume_path, digest) in enumerate(zip(volumes, volume_paths, digests), start=1):
+            if done_volumes.get(os.path.basename(volume_path)) == digest and os.path.exists(volume_path):
+                finished[number] = volume_path
+                self.report_row(status_callback, f"第 {number}/{len(volumes)} 卷已在上次完成，跳过")
+            else:
+                tasks.append((number, (self.output_dir, volume, volume_path, self.merge_engine)))
+
+        executor = None
+        if tasks and self.workers > 1:
+            if self.executor is not None:
+                results = self.executor.map(_merge_volume_worker, *zip(*(task for _, task in tasks)))
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+                executor = ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)))
+                results = executor.map(_merge_volume_worker, *zip(*(task for _, task in tasks)))
+        else:
+            results = (_merge_volume_worker(*task) for _, task in tasks)
+
+        try:
+            for (number, _), (volume_path, ok, messages, failed) in zip(tasks, results):
+                self.merge_fail_count += failed
+                for message in messages:
+                    status_callback(f"[第{number}卷] {message.strip()}")
+                if ok:
+                    finished[number] = volume_path
+                    self.append_journal([{"volume": os.path.basename(volume_path), "digest": digests[number - 1]}],
+                                        status_callback)
+                self.report_row(status_callback, f"已完成第 {number}/{len(volumes)} 卷", ok=ok)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self.merge_outputs = [finished[number] for number in sorted(finished)]
+        self.progress.finish()
+        status_callback(f"\n分卷合并完成！{len(self.merge_outputs)}/{len(volumes)} 卷（耗时：{time.perf_counter() - merge_start:.2f}秒）")
+        return self.merge_outputs if len(self.merge_outputs) == len(volumes) else None
+
+    def volume_digest(self, docx_paths):
+        """分卷指纹：卷内证书文件名及顺序"""
+        names = "\n".join(os.path.basename(path) for path in docx_paths)
+        return hashlib.sha256(names.encode("utf-8")).hexdigest()
+
+    def merge_docx_fast(self, docx_paths, status_callback):
+        """快速合并：共享部件只取第一个文件，其余文件只追加正文XML"""
+        merge_start = time.perf_counter()
+        total_docs = len(docx_paths)
+        from docx import Document
+        merger = FastMerger(Document(docx_paths[0]))
+        status_callback(f"开始快速合并 {total_docs} 个文档...")
+        self.progress.start("合并", total_docs)
+        self.progress.advance()
+
+        for i, doc_path in enumerate(docx_paths[1:], 1):
+            try:
+                with self.instrumentation.stage("merge_append", i + 1, os.path.basename(doc_path)):
+                    merger.append_file(doc_path)
+                self.report_row(status_callback, f"已合并 {i+1}/{total_docs} 个文档")
+            except Exception as e:
+                self.merge_fail_count += 1
+                self.report_row(status_callback, f"合并 {os.path.basename(doc_path)} 时出错：{str(e)}", ok=False)
+
+        self.progress.finish()
+
+        merger.save(self.merge_output)
+        self.deduplicate_merged_media(self.merge_output, status_callback)
+        status_callback(f"\n合并完成！（耗时：{time.perf_counter() - merge_start:.2f}秒）")
+        status_callback(f"保存路径：{os.path.abspath(self.merge_output)}")
+        return self.merge_output
+
+    def export_pdf(self, status_callback):
+        """通过 LibreOffice 把合并文件（或每个证书）转换为PDF；未安装时跳过，保留Word文件"""
+        self.pdf_files = []
+        if self.pdf_mode == "each" and self.generated_files:
+            docx_paths = list(self.generated_files)
+            pdf_dir = os.path.join(self.output_dir, "PDF")
+        else:
+            docx_paths = [path for path in self.merge_outputs if os.path.exists(path)]
+            pdf_dir = os.path.dirname(os.path.abspath(self.merge_output))
+        if not docx_paths:
+            status_callback("没有可转换的文件，跳过PDF导出")
+            return True
+
+        converter = PdfConverter(self.soffice, self.workers, timeout=self.pdf_timeout)
+        if not converter.available:
+            status_callback("未找到 LibreOffice（soffice），跳过PDF导出，请使用Word文件：")
+            for path in (self.merge_outputs or docx_paths[:1]):
+                status_callback(f"  {os.path.abspath(path)}")
+            return True
+
+        pdf_start = time.perf_counter()
+        total = len(docx_paths)
+        status_callback(f"开始转换 {total} 个文件为PDF（{converter.workers} 个 LibreOffice 进程）...")
+        self.progress.start("PDF", total)
+        pdf_files = {}
+        with self.instrumentation.stage("pdf_export", detail=f"{total} files"):
+            for batch in converter.iter_convert(docx_paths, pdf_dir):
+                for docx_path, pdf_path in batch:
+                    if pdf_path:
+                        pdf_files[docx_path] = pdf_path
+                        self.report_row(status_callback, f"已转换 {len(pdf_files)}/{total}：{os.path.basename(pdf_path)}")
+                    else:
+                        self.report_row(status_callback, f"转换 {os.path.basename(docx_path)} 为PDF失败", ok=False)
+        self.progress.finish()
+
+        # 按原顺序记录
+        self.pdf_files = [pdf_files[path] for path in docx_paths if path in pdf_files]
+        status_callback(f"\nPDF导出完成！{len(self.pdf_files)}/{total}（耗时：{time.perf_counter() - pdf_start:.2f}秒）")
+        status_callback(f"保存路径：{os.path.abspath(pdf_dir)}")
+        return len(self.pdf_files) == total
+
+    def merge_docx_stream(self, docx_paths, status_callback):
+        """流式合并：正文边读边写入合并文件，共享部件只写一次，内存占用不随证书数量增长"""
+        merge_start = time.perf_counter()
+        total_docs = len(docx_paths)
+        merger = StreamingMerger(docx_paths[0], self.merge_output)
+        status_callback(f"开始流式合并 {total_docs} 个文档...")
+        self.progress.start("合并", total_docs)
+        self.progress.advance()
+
+        try:
+            for i, doc_path in enumerate(docx_paths[1:], 1):
+                try:
+                    with self.instrumentation.stage("merge_append", i + 1, os.path.basename(doc_path)):
+                        merger.append_file(doc_path)
+                    self.report_row(status_callback, f"已合并 {i+1}/{total_docs} 个文档")
+                except Exception as e:
+                    self.merge_fail_count += 1
+                    self.report_row(status_callback, f"合并 {os.path.basename(doc_path)} 时出错：{str(e)}", ok=False)
+            merger.close()
+        except BaseException:
+            merger.abort()
+            raise
+
+        self.progress.finish()
+        self.deduplicate_merged_media(self.merge_output, status_callback)
+        status_callback(f"\n合并完成！（耗时：{time.perf_counter() - merge_start:.2f}秒）")
+        status_callback(f"保存路径：{os.path.abspath(self.merge_output)}")
+        return self.merge_output
+
+    def deduplicate_merged_media(self, path, status_callback):
+        """合并文件中内容相同的图片只保留一份；去重失败不影响已写出的合并文件"""
+        try:
+            with self.instrumentation.stage("dedupe_media", None, os.path.basename(path)):
+                removed = deduplicate_media(path)
+        except Exception as e:
+            status_callback(f"图片去重失败（合并文件仍可使用）：{str(e)}")
+            return
+        if removed:
+            status_callback(f"已去除合并文件中 {removed} 个重复图片")
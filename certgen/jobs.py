@@ -0,0 +1,127 @@
+"""批量任务：一次运行多个（数据库, 工作表, 模板, 配置）组合，各自输出到独立的目录和合并文件
+
+任务文件为 JSON，示例：
+    {
+        "output_root": "./输出",
+        "jobs": [
+            {"database": "报名.xlsx", "sheet": "一班", "template": "培训模板.docx", "preset": "就业创业培训"},
+            {"database": "报名.xlsx", "sheet": "二班", "template": "培训模板.docx", "preset": "就业创业培训"},
+            {"name": "大赛", "database": "大赛.xlsx", "template": "大赛模板.docx", "config": "大赛配置.json"},
+            {"name": "报名", "database": "报名.db", "query": "SELECT * FROM 报名 WHERE 批次 = 3",
+             "template": "培训模板.docx", "preset": "就业创业培训"}
+        ]
+    }
+
+相对路径以任务文件所在目录为基准。database 可以是 Excel、CSV 或 SQLite 文件；SQLite 的 sheet
+为表名，也可用 query 指定查询语句。每个任务可选 name（默认为“数据库名_工作表名”）、
+output_dir（默认 output_root/name）、merge_output（默认 output_root/name.docx）。
+"""
+import json
+import os
+
+from .generator import DocumentGenerator
+from .presets import PRESETS, load_config_file
+
+
+def load_job_file(filename):
+    """读取任务文件，返回任务列表；每个任务的配置已解析为 replacement_config"""
+    with open(filename, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(filename))
+    if isinstance(spec, list):
+        spec = {"jobs": spec}
+    if not isinstance(spec, dict) or not isinstance(spec.get("jobs"), list) or not spec["jobs"]:
+        raise ValueError("任务文件格式不正确：缺少 jobs 列表")
+
+    def resolve(path):
+        return os.path.join(base_dir, path)
+
+    output_root = resolve(spec.get("output_root", "."))
+    jobs = []
+    names = set()
+    for number, entry in enumerate(spec["jobs"], start=1):
+        if not isinstance(entry, dict) or not all(key in entry for key in ("database", "template")):
+            raise ValueError(f"第{number}个任务缺少 database 或 template")
+        if ("preset" in entry) == ("config" in entry):
+            raise ValueError(f"第{number}个任务需要且只能指定 preset 或 config 之一")
+        if "preset" in entry:
+            if not PRESETS.get(entry["preset"]):
+                raise ValueError(f"第{number}个任务的预设「{entry['preset']}」不存在或为空")
+            replacement_config = PRESETS[entry["preset"]]
+        else:
+            replacement_config = load_config_file(resolve(entry["config"]))
+
+        sheet = entry.get("sheet")
+        name = entry.get("name") or "_".join(
+            part for part in (os.path.splitext(os.path.basename(entry["database"]))[0], sheet) if part)
+        if name in names:
+            raise ValueError(f"任务名「{name}」重复，请为任务指定不同的 name")
+        names.add(name)
+        jobs.append({
+            "name": name,
+            "database": resolve(entry["database"]),
+            "sheet": sheet,
+            "query": entry.get("query"),
+            "template": resolve(entry["template"]),
+            "replacement_config": replacement_config,
+            "output_dir": resolve(entry["output_dir"]) if "output_dir" in entry else os.path.join(output_root, name),
+            "merge_output": (resolve(entry["merge_output"]) if "merge_output" in entry
+                             else os.path.join(output_root, name + ".docx")),
+        })
+    return jobs
+
+
+class JobRunner:
+    """依次运行多个任务，共用一个进程池和模板缓存
+
+    同一模板和配置只解析一次；子进程在整个批次中保持运行，已编译的模板也随之保留。
+    options 为传给每个 DocumentGenerator 的其余参数（如 merge_engine、direct_merge）。
+    """
+
+    def __init__(self, jobs, workers=1, **options):
+        self.jobs = jobs
+        self.workers = max(1, workers or 1)
+        self.options = options
+        self.template_cache = {}
+        self.results = [] # [(任务名, 退出码)]
+
+    def run(self, status_callback, merge=True, progress_callback=None, dry_run=False):
+        """运行全部任务，全部成功返回 0，否则返回 1；单个任务失败不影响后续任务
+
+        dry_run=True 时每个任务只做预检，预检未通过记为失败。
+        """
+        self.results = []
+        executor = None
+        if self.workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            for number, job in enumerate(self.jobs, start=1):
+                name = job["name"]
+                status_callback(f"\n===== 任务 {number}/{len(self.jobs)}：{name} =====")
+                prefixed = lambda message, name=name: status_callback(f"[{name}] {message}")
+                try:
+                    generator = DocumentGenerator(job["database"], job["template"], job["output_dir"],
+                                                  job["merge_output"], job["replacement_config"],
+                                                  workers=self.workers, sheet=job["sheet"], query=job["query"],
+                                                  executor=executor, template_cache=self.template_cache,
+                                                  **self.options)
+                    generator.progress.callback = progress_callback
+                    if dry_run:
+                        report = generator.preflight(prefixed)
+                        result = 0 if report is not None and report.ok else 1
+                    else:
+                        result = generator.generate_and_merge(prefixed, merge=merge)
+                except Exception as e:
+                    prefixed(f"操作出错: {str(e)}")
+                    result = 1
+                self.results.append((name, result))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        failed = [name for name, result in self.results if result != 0]
+        status_callback(f"\n批量任务完成：成功 {len(self.results) - len(failed)}/{len(self.results)}")
+        if failed:
+            status_callback(f"失败的任务：{'、'.join(failed)}")
+        return 1 if failed else 0
@@ -0,0 +1,205 @@
+import os
+import hashlib
+import posixpath
+import shutil
+import struct
+import time
+import zipfile
+import zlib
+
+MEDIA_PREFIX = "word/media/"
+CONTENT_TYPES = "[Content_Types].xml"
+RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+# 图片部件的压缩方式：PNG/JPEG 本身已压缩，再次 deflate 几乎不减小体积却很耗时
+MEDIA_COMPRESSIONS = {
+    "deflate": (zipfile.ZIP_DEFLATED, None), # 与 python-docx 默认保存一致
+    "fast": (zipfile.ZIP_DEFLATED, 1), # 最快的 deflate 级别
+    "store": (zipfile.ZIP_STORED, None), # 不压缩
+}
+
+class _ZipPartWriter:
+    """供 python-docx 的 PackageWriter 写入部件：XML 按默认方式压缩，图片按指定方式压缩"""
+
+    def __init__(self, path, media_compression):
+        self.zipf = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self.media_compression = MEDIA_COMPRESSIONS[media_compression]
+
+    def write(self, pack_uri, blob):
+        self.write_member(pack_uri.membername, blob)
+
+    def write_member(self, name, blob):
+        if name.startswith(MEDIA_PREFIX):
+            compress_type, compresslevel = self.media_compression
+            self.zipf.writestr(name, blob, compress_type=compress_type, compresslevel=compresslevel)
+        else:
+            self.zipf.writestr(name, blob)
+
+    def close(self):
+        self.zipf.close()
+
+class _PartCollector:
+    """代替 zip 写入：只收集 (成员名, 内容)，压缩和写盘留到之后进行"""
+
+    def __init__(self):
+        self.members = []
+
+    def write(self, pack_uri, blob):
+        self.members.append((pack_uri.membername, blob))
+
+def _write_package(document, writer):
+    """与 PackageWriter.write 的写入顺序相同，只替换底层的 zip 写入"""
+    from docx.opc.pkgwriter import PackageWriter # 首次使用时才导入
+    package = document.part.package
+    parts = package.parts
+    for part in parts:
+        part.before_marshal()
+    PackageWriter._write_content_types_stream(writer, parts)
+    PackageWriter._write_pkg_rels(writer, package.rels)
+    PackageWriter._write_parts(writer, parts)
+
+def serialize_document(document):
+    """把文档各部件序列化为 [(成员名, 内容)]；结果不再引用文档，可以在其他线程中写入"""
+    collector = _PartCollector()
+    _write_package(document, collector)
+    return collector.members
+
+def write_members(path, members, media_compression="deflate"):
+    """把 serialize_document 的结果写为 docx 文件"""
+    writer = _ZipPartWriter(path, media_compression)
+    try:
+        for name, blob in members:
+            writer.write_member(name, blob)
+    finally:
+        writer.close()
+
+def save_document(document, path, media_compression="deflate"):
+    """保存文档，图片部件（word/media/）使用 media_compression 指定的压缩方式"""
+    if media_compression == "deflate":
+        document.save(path)
+        return
+    writer = _ZipPartWriter(path, media_compression)
+    try:
+        _write_package(document, writer)
+    finally:
+        writer.close()
+
+def find_duplicate_media(docx_zip):
+    """按内容哈希查找重复的图片部件，返回 {重复部件名: 保留的部件名}"""
+    first_by_hash = {}
+    duplicates = {}
+    for info in docx_zip.infolist():
+        if not info.filename.startswith(MEDIA_PREFIX):
+            continue
+        sha = hashlib.sha256()
+        with docx_zip.open(info) as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        key = (info.file_size, sha.digest())
+        if key in first_by_hash:
+            duplicates[info.filename] = first_by_hash[key]
+        else:
+            first_by_hash[key] = info.filename
+    return duplicates
+
+def rewrite_rels(rels_name, xml, duplicates):
+    """把关系文件中指向重复图片的 Target 改为保留的图片，没有改动时返回 None"""
+    from lxml import etree
+    # word/_rels/document.xml.rels 描述的是 word/document.xml，相对路径以 word/ 为基准
+    base = posixpath.dirname(posixpath.dirname(rels_name))
+    root = etree.fromstring(xml)
+    changed = False
+    for rel in root.iter("{%s}Relationship" % RELS_NS):
+        target = rel.get("Target")
+        if not target or rel.get("TargetMode") == "External":
+            continue
+        name = target[1:] if target.startswith("/") else posixpath.normpath(posixpath.join(base, target))
+        if name in duplicates:
+            kept = duplicates[name]
+            rel.set("Target", "/" + kept if target.startswith("/") else posixpath.relpath(kept, base or "."))
+            changed = True
+    if not changed:
+        return None
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+def rewrite_content_types(xml, duplicates):
+    """删除已移除图片的 Override 声明"""
+    from lxml import etree
+    root = etree.fromstring(xml)
+    for override in root.findall("{%s}Override" % CT_NS):
+        if override.get("PartName", "").lstrip("/") in duplicates:
+            root.remove(override)
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+def deduplicate_media(path):
+    """合并文件中内容相同的图片只保留一份，返回删除的图片数量
+
+    没有重复时只读取图片部件，不改写文件；有重复时把所有关系指向保留的图片，
+    写入临时文件后替换原文件，未改动的部件保持原有压缩方式。
+    """
+    with zipfile.ZipFile(path) as source:
+        duplicates = find_duplicate_media(source)
+        if not duplicates:
+            return 0
+        tmp_path = path + ".dedup"
+        try:
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as target:
+                for info in source.infolist():
+                    if info.filename in duplicates:
+                        continue
+                    if info.filename.endswith(".rels"):
+                        data = source.read(info)
+                        target.writestr(info, rewrite_rels(info.filename, data, duplicates) or data)
+                    elif info.filename == CONTENT_TYPES:
+                        target.writestr(info, rewrite_content_types(source.read(info), duplicates))
+                    else:
+                        # 正文可能很大，逐块复制，不整体读入内存
+                        copy_info = zipfile.ZipInfo(info.filename, info.date_time)
+                        copy_info.compress_type = info.compress_type
+                        copy_info.file_size = info.file_size # 据此判断是否需要 zip64
+                        with source.open(info) as src, target.open(copy_info, "w") as dst:
+                            shutil.copyfileobj(src, dst, 1 << 20)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+    return len(duplicates)
+
+# 直接写 zip 结构：不变的部件只压缩一次，之后每个证书原样写入压缩好的数据
+_ZIP_FLAGS = 0x0800 # 文件名为 UTF-8
+
+def _dos_datetime(timestamp=None):
+    t = time.localtime(timestamp)
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+def compress_member(name, blob, media_compression="deflate"):
+    """压缩一个部件，返回 write_zip 所需的条目 (文件名, 压缩方式, CRC, 压缩后数据, 原始大小)"""
+    compress_type, compresslevel = MEDIA_COMPRESSIONS[media_compression if name.startswith(MEDIA_PREFIX) else "deflate"]
+    if compress_type == zipfile.ZIP_STORED:
+        data = blob
+    else:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if compresslevel is None else compresslevel,
+                                      zlib.DEFLATED, -15)
+        data = compressor.compress(blob) + compressor.flush()
+    return name.encode("utf-8"), compress_type, zlib.crc32(blob), data, len(blob)
+
+def write_zip(path, entries, timestamp=None):
+    """把 compress_member 得到的条目写为 zip 文件（单个证书远小于 4GB，不需要 zip64）"""
+    dos_time, dos_date = _dos_datetime(timestamp)
+    central = []
+    offset = 0
+    with open(path, "wb") as f:
+        for name, compress_type, crc, data, size in entries:
+            header = struct.pack("<4s5H3I2H", b"PK\x03\x04", 20, _ZIP_FLAGS, compress_type, dos_time, dos_date,
+                                 crc, len(data), size, len(name), 0)
+            f.write(header)
+            f.write(name)
+            f.write(data)
+            central.append(struct.pack("<4s6H3I5H2I", b"PK\x01\x02", 20, 20, _ZIP_FLAGS, compress_type, dos_time,
+                                       dos_date, crc, len(data), size, len(name), 0, 0, 0, 0, 0, offset) + name)
+            offset += len(header) + len(name) + len(data)
+        directory = b"".join(central)
+        f.write(directory)
+        f.write(struct.pack("<4s4H2IH", b"PK\x05\x06", 0, 0, len(entries), len(entries), len(directory), offset, 0))
@@ -0,0 +1,398 @@
+import os
+import re
+import shutil
+import hashlib
+import posixpath
+import zipfile
+from copy import deepcopy
+
+# python-docx / docxcompose 在首次使用时才导入，这里直接写出用到的限定名
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W_P = "{%s}p" % W_NS
+W_SECT_PR = "{%s}sectPr" % W_NS
+W_BODY = "{%s}body" % W_NS
+W_ID = "{%s}id" % W_NS
+W_HEADER_FOOTER_REFS = ("{%s}headerReference" % W_NS, "{%s}footerReference" % W_NS)
+R_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+HEADER_FOOTER_RELTYPES = ("http://schemas.openxmlformats.org/officeDocument/2006/relationships/header",
+                          "http://schemas.openxmlformats.org/officeDocument/2006/relationships/footer")
+DOCUMENT_XML = "word/document.xml"
+DOCUMENT_RELS = "word/_rels/document.xml.rels"
+CONTENT_TYPES = "[Content_Types].xml"
+
+def get_header_footer_names(rels_xml):
+    """从 document.xml.rels 中找出页眉页脚：{关系ID: (关系类型, zip中的部件名)}"""
+    from lxml import etree # 首次使用时才导入
+    names = {}
+    for rel in etree.fromstring(rels_xml):
+        if rel.get("Type") in HEADER_FOOTER_RELTYPES and rel.get("TargetMode") != "External":
+            name = posixpath.normpath(posixpath.join("word", rel.get("Target"))).lstrip("/")
+            names[rel.get("Id")] = (rel.get("Type"), name)
+    return names
+
+def read_header_footer(docx_zip):
+    """读取证书中的页眉页脚部件：{关系ID: 内容}"""
+    names = get_header_footer_names(docx_zip.read(DOCUMENT_RELS))
+    return {rId: docx_zip.read(name) for rId, (_, name) in names.items()}
+
+def header_footer_varies(docx_paths):
+    """各证书的页眉页脚是否不同（页眉页脚中含占位符）；发现第一处不同即返回
+
+    无法读取的证书跳过不比较，由合并时逐个报告出错。
+    """
+    first = None
+    for path in docx_paths:
+        try:
+            with zipfile.ZipFile(path) as docx_zip:
+                header_footer = read_header_footer(docx_zip)
+        except Exception:
+            continue
+        if first is None:
+            first = header_footer
+        elif header_footer != first:
+            return True
+    return False
+
+class BodyMerger:
+    """追加正文XML的公共部分：新追加内容的绘图对象、书签编号从现有最大值之后继续，避免重复
+
+    页眉页脚中含占位符时，每个证书的页眉页脚内容不同：与第一个证书不同的页眉页脚另存为新部件
+    （内容相同的证书共用一份），本证书所在的节改为引用新部件。子类实现 add_header_footer_part。
+    """
+
+    def __init__(self, body, sect_pr, header_footer):
+        """sect_pr 为最后一节的页面设置，header_footer 为第一个证书的 {关系ID: 页眉页脚内容}"""
+        self.next_docpr_id = max([int(x) for x in body.xpath(".//wp:docPr/@id")] + [0]) + 1
+        self.next_bookmark_id = max([int(x) for x in body.xpath(".//w:bookmarkStart/@w:id")] + [-1]) + 1
+        self.header_footer = header_footer
+        self.header_footer_copies = {} # {(关系ID, 内容摘要): 新部件的关系ID}，只记摘要，不保留内容
+        # 最后一节引用的页眉页脚（模板中的关系ID），每追加一个证书改为引用该证书的部件
+        self.section_refs = [(ref, ref.get(R_ID)) for ref in sect_pr.iter(*W_HEADER_FOOTER_REFS)]
+
+    def get_header_footer_mapping(self, blobs):
+        """对比追加证书的页眉页脚，返回 {模板中的关系ID: 本证书所用部件的关系ID}（只含内容不同的）"""
+        mapping = {}
+        for rId, blob in blobs.items():
+            if blob == self.header_footer.get(rId):
+                continue
+            key = (rId, hashlib.sha1(blob).digest())
+            if key not in self.header_footer_copies:
+                self.header_footer_copies[key] = self.add_header_footer_part(rId, blob)
+            mapping[rId] = self.header_footer_copies[key]
+        return mapping
+
+    def add_header_footer_part(self, rId, blob):
+        """把一份页眉页脚另存为新部件（沿用 rId 对应部件的类型和关系），返回新的关系ID"""
+        raise NotImplementedError
+
+    def apply_header_footer(self, elements, mapping):
+        """新追加的正文（含其中的分节符）和最后一节改为引用本证书的页眉页脚"""
+        for ref, rId in self.section_refs:
+            ref.set(R_ID, mapping.get(rId, rId))
+        if not mapping:
+            return
+        for element in elements:
+            for ref in element.iter(*W_HEADER_FOOTER_REFS):
+                if ref.get(R_ID) in mapping:
+                    ref.set(R_ID, mapping[ref.get(R_ID)])
+
+    def renumber_ids(self, elements):
+        """elements 为一份证书的全部正文元素：书签整体加同一个偏移，跨段落的书签首尾仍然成对"""
+        offset = self.next_bookmark_id
+        for element in elements:
+            for doc_pr in element.xpath(".//wp:docPr"):
+                doc_pr.set("id", str(self.next_docpr_id))
+                self.next_docpr_id += 1
+            for bookmark in element.xpath(".//w:bookmarkStart | .//w:bookmarkEnd"):
+                bookmark_id = int(bookmark.get(W_ID)) + offset
+                bookmark.set(W_ID, str(bookmark_id))
+                self.next_bookmark_id = max(self.next_bookmark_id, bookmark_id + 1)
+
+    @staticmethod
+    def is_section_end(element):
+        """元素是否为已带分节符的段落（不能再写入分节符）"""
+        return element.tag != W_P or element.pPr is not None and element.pPr.sectPr is not None
+
+class FastMerger(BodyMerger):
+    """同模板证书的快速合并器
+
+    所有证书来自同一模板，样式、编号、图片等共享部件完全一致，
+    因此只保留主文档的一份，之后逐个追加正文XML并用分节符分隔，
+    合并耗时随证书数量线性增长。关系（rels）与主文档不一致的文件回退到docxcompose。
+    """
+
+    def __init__(self, main_doc):
+        self.doc = main_doc
+        self.body = main_doc.element.body
+        self.sect_pr = self.body.get_or_add_sectPr() # 最后一节的页面设置，所有证书共用
+        self.rels_signature = self.get_rels_signature(main_doc.part)
+        self.rels_xml = main_doc.part.rels.xml # 新增页眉页脚部件之前的关系，用于判断证书是否同模板
+        self.header_footer_rels = {rel.rId: rel for rel in main_doc.part.rels.values()
+                                   if rel.reltype in HEADER_FOOTER_RELTYPES and not rel.is_external}
+        super().__init__(self.body, self.sect_pr,
+                         {rId: rel.target_part.blob for rId, rel in self.header_footer_rels.items()})
+        self.partnames = {str(part.partname) for part in main_doc.part.package.iter_parts()}
+        self.composer = None
+
+    @staticmethod
+    def get_rels_signature(part):
+        return sorted((rel.rId, rel.reltype, rel.target_ref) for rel in part.rels.values())
+
+    def append_document(self, doc):
+        """追加一个已打开的文档（文档本身不会被修改）"""
+        if self.get_rels_signature(doc.part) != self.rels_signature:
+            self.append_with_composer(doc)
+            return
+        blobs = {rId: doc.part.rels[rId].target_part.blob for rId in self.header_footer_rels}
+        self.append_body(doc.element.body, copy=True, mapping=self.get_header_footer_mapping(blobs))
+
+    def append_file(self, doc_path):
+        """追加一个证书文件，只读取其中的 word/document.xml（和页眉页脚）"""
+        with zipfile.ZipFile(doc_path) as docx_zip:
+            rels_xml = docx_zip.read(DOCUMENT_RELS)
+            document_xml = docx_zip.read(DOCUMENT_XML)
+            if rels_xml == self.rels_xml:
+                blobs = {rId: docx_zip.read(rel.target_part.partname.membername)
+                         for rId, rel in self.header_footer_rels.items()}
+        if rels_xml != self.rels_xml:
+            from docx import Document
+            self.append_with_composer(Document(doc_path))
+            return
+        from docx.oxml import parse_xml
+        self.append_body(parse_xml(document_xml).find(W_BODY), copy=False,
+                         mapping=self.get_header_footer_mapping(blobs))
+
+    def append_body(self, body, copy, mapping):
+        elements = [el for el in body if el.tag != W_SECT_PR]
+        if copy:
+            elements = [deepcopy(el) for el in elements]
+        self.add_section_break()
+        self.renumber_ids(elements)
+        self.apply_header_footer(elements, mapping)
+        for element in elements:
+            self.sect_pr.addprevious(element)
+
+    def add_header_footer_part(self, rId, blob):
+        from docx.oxml import parse_xml
+        from docx.opc.packuri import PackURI
+        rel = self.header_footer_rels[rId]
+        source = rel.target_part
+        # 部件名按 header1.xml、header2.xml 的规则递增，跳过已存在的
+        template = re.sub(r"\d*\.xml$", "%d.xml", str(source.partname))
+        number = 1
+        while template % number in self.partnames:
+            number += 1
+        partname = PackURI(template % number)
+        self.partnames.add(partname)
+        part = type(source)(partname, source.content_type, parse_xml(blob), source.package)
+        for source_rel in source.rels.values(): # 页眉页脚中的图片等沿用原部件的关系
+            target = source_rel.target_ref if source_rel.is_external else source_rel.target_part
+            part.rels.add_relationship(source_rel.reltype, target, source_rel.rId, source_rel.is_external)
+        return self.doc.part.relate_to(part, rel.reltype)
+
+    def add_section_break(self):
+        """在当前最后一个段落中写入分节符（下一页），结束上一份证书所在的节"""
+        from docx.oxml import parse_xml
+        last = self.sect_pr.getprevious()
+        if last is None or self.is_section_end(last):
+            last = parse_xml('<w:p xmlns:w="%s"/>' % W_NS)
+            self.sect_pr.addprevious(last)
+        last.get_or_add_pPr()._insert_sectPr(deepcopy(self.sect_pr))
+
+    def append_with_composer(self, doc):
+        if self.composer is None:
+            from docxcompose.composer import Composer
+            self.composer = Composer(self.doc)
+        self.doc.add_page_break()
+        self.composer.append(doc)
+
+    def save(self, path):
+        self.doc.save(path)
+
+class StreamingMerger(BodyMerger):
+    """流式合并器：合并结果边追加边写入zip，内存占用与证书数量无关
+
+    共享部件（样式、编号、图片等）只从第一个证书复制一次；之后每个证书只解析其
+    word/document.xml（和页眉页脚），正文写入输出后即释放；与第一个证书不同的页眉页脚另存为新部件。
+    每份证书的最后一个元素暂不写出，等下一份到来时在其中写入分节符。
+    要求所有证书的关系（rels）一致，即来自同一模板。
+    """
+
+    def __init__(self, first_doc, output_path):
+        """first_doc 为第一个证书的路径或文件对象，合并结果先写入临时文件，close 时替换为 output_path"""
+        from docx.oxml import parse_xml # 首次使用时才导入
+        self.parse_xml = parse_xml
+        self.output_path = output_path
+        self.tmp_path = output_path + ".part"
+        self.output = zipfile.ZipFile(self.tmp_path, "w", zipfile.ZIP_DEFLATED)
+        self.parts_path = output_path + ".parts" # 新增的页眉页脚部件先写入这里，close 时并入合并文件
+        self.parts_zip = None
+        self.added_rels = [] # [(关系ID, 关系类型, 部件名, 原部件名)]
+        try:
+            with zipfile.ZipFile(first_doc) as first_zip:
+                self.rels_xml = first_zip.read(DOCUMENT_RELS)
+                self.content_types_xml = first_zip.read(CONTENT_TYPES)
+                document_xml = first_zip.read(DOCUMENT_XML)
+                self.part_names = set(first_zip.namelist())
+                self.header_footer_names = get_header_footer_names(self.rels_xml)
+                header_footer = {rId: first_zip.read(name) for rId, (_, name) in self.header_footer_names.items()}
+                self.header_footer_part_rels = {} # 页眉页脚自身的关系（如其中的图片），新部件沿用
+                for rId, (_, name) in self.header_footer_names.items():
+                    rels_name = posixpath.join(posixpath.dirname(name), "_rels", posixpath.basename(name) + ".rels")
+                    if rels_name in self.part_names:
+                        self.header_footer_part_rels[rId] = first_zip.read(rels_name)
+                # 关系和内容类型在 close 时写出，以便加入新增的页眉页脚部件
+                for info in first_zip.infolist():
+                    if info.filename not in (DOCUMENT_XML, DOCUMENT_RELS, CONTENT_TYPES):
+                        with first_zip.open(info) as src, self.output.open(info.filename, "w") as dst:
+                            shutil.copyfileobj(src, dst)
+
+            # document.xml 的开头（到 <w:body> 为止）和结尾沿用第一个证书的原文
+            body_start = re.search(rb"<(?:\w+:)?body(?:\s[^>]*)?>", document_xml)
+            if body_start is None:
+                raise ValueError("第一个证书的正文为空，无法合并")
+            body_end = document_xml.rindex(b"</", 0, document_xml.rindex(b"</"))
+            self.tail = document_xml[body_end:]
+            body = parse_xml(document_xml).find(W_BODY)
+            self.sect_pr = body.find(W_SECT_PR) # 最后一节的页面设置，所有证书共用
+            if self.sect_pr is None:
+                raise ValueError("第一个证书缺少页面设置（sectPr），无法合并")
+            super().__init__(body, self.sect_pr, header_footer)
+
+            self.stream = self.output.open(DOCUMENT_XML, "w", force_zip64=True)
+            self.stream.write(document_xml[:body_start.end()])
+            self.pending = None
+            self.last_body = body
+            self.write_body(body, renumber=False)
+        except Exception:
+            self.abort()
+            raise
+
+    def append_file(self, doc_path):
+        """追加一个证书文件，只读取其中的 word/document.xml（和页眉页脚）"""
+        with zipfile.ZipFile(doc_path) as docx_zip:
+            rels_xml = docx_zip.read(DOCUMENT_RELS)
+            if rels_xml != self.rels_xml:
+                raise ValueError("关系（rels）与第一个证书不一致，无法流式合并，请改用兼容合并")
+            document_xml = docx_zip.read(DOCUMENT_XML)
+            blobs = {rId: docx_zip.read(name) for rId, (_, name) in self.header_footer_names.items()}
+        self.write_body(self.parse_xml(document_xml).find(W_BODY), renumber=True,
+                        mapping=self.get_header_footer_mapping(blobs))
+
+    def append_document(self, doc):
+        """追加一个已打开的文档（文档本身不会被修改）"""
+        if doc.part.rels.xml != self.rels_xml:
+            raise ValueError("关系（rels）与第一个证书不一致，无法流式合并，请改用兼容合并")
+        blobs = {rId: doc.part.rels[rId].target_part.blob for rId in self.header_footer_names}
+        self.write_body(deepcopy(doc.element.body), renumber=True, mapping=self.get_header_footer_mapping(blobs))
+
+    def add_header_footer_part(self, rId, blob):
+        reltype, name = self.header_footer_names[rId]
+        # 部件名按 header1.xml、header2.xml 的规则递增，跳过已存在的
+        template = re.sub(r"\d*\.xml$", "%d.xml", name)
+        number = 1
+        while template % number in self.part_names:
+            number += 1
+        new_name = template % number
+        self.part_names.add(new_name)
+        if self.parts_zip is None:
+            self.parts_zip = zipfile.ZipFile(self.parts_path, "w", zipfile.ZIP_DEFLATED)
+        self.parts_zip.writestr(new_name, blob)
+        if rId in self.header_footer_part_rels:
+            self.parts_zip.writestr(posixpath.join(posixpath.dirname(new_name), "_rels",
+                                                   posixpath.basename(new_name) + ".rels"),
+                                    self.header_footer_part_rels[rId])
+        new_rId = "rIdHf%d" % (len(self.added_rels) + 1) # 与 python-docx 的 rId 数字编号不会冲突
+        self.added_rels.append((new_rId, reltype, new_name, name))
+        return new_rId
+
+    def write_body(self, body, renumber, mapping=None):
+        """写出一份证书的正文：上一份证书留下的最后一个元素写入分节符后一并写出"""
+        for sect_pr in body.findall(W_SECT_PR):
+            body.remove(sect_pr)
+        if renumber:
+            self.renumber_ids(list(body))
+        head = []
+        if self.pending is not None:
+            head = [self.pending]
+            if self.is_section_end(self.pending):
+                head.append(self.parse_xml('<w:p xmlns:w="%s"/>' % W_NS))
+            head[-1].get_or_add_pPr()._insert_sectPr(deepcopy(self.sect_pr))
+        # 分节符已按上一份证书的页眉页脚写出，之后的节改为引用本证书的
+        self.apply_header_footer(list(body), mapping or {})
+        for position, element in enumerate(head):
+            body.insert(position, element)
+        self.pending = None
+        if len(body):
+            self.pending = body[-1]
+            body.remove(self.pending)
+        self.write_children(body)
+        self.last_body = body
+
+    def write_children(self, body):
+        """写出正文的子元素：序列化整个 body 后去掉首尾标签，子元素无需重复声明命名空间"""
+        if not len(body):
+            return
+        from lxml import etree
+        xml = etree.tostring(body, encoding="utf-8")
+        self.stream.write(xml[xml.index(b">") + 1:xml.rindex(b"</")])
+
+    def close(self):
+        """写出最后一个元素和页面设置，完成合并文件"""
+        body = self.last_body
+        for child in list(body):
+            body.remove(child)
+        if self.pending is not None:
+            body.append(self.pending)
+        body.append(self.sect_pr)
+        self.write_children(body)
+        self.stream.write(self.tail)
+        self.stream.close()
+        self.write_package_parts()
+        self.output.close()
+        os.replace(self.tmp_path, self.output_path)
+        if os.path.exists(self.parts_path):
+            os.remove(self.parts_path)
+
+    def write_package_parts(self):
+        """写出新增的页眉页脚部件，以及加入了这些部件的关系和内容类型"""
+        if not self.added_rels:
+            self.output.writestr(CONTENT_TYPES, self.content_types_xml)
+            self.output.writestr(DOCUMENT_RELS, self.rels_xml)
+            return
+        from lxml import etree
+        rels = etree.fromstring(self.rels_xml)
+        content_types = etree.fromstring(self.content_types_xml)
+        overrides = {override.get("PartName"): override.get("ContentType")
+                     for override in content_types.iter("{%s}Override" % CT_NS)}
+        if self.parts_zip is not None:
+            self.parts_zip.close()
+            with zipfile.ZipFile(self.parts_path) as parts_zip:
+                for info in parts_zip.infolist():
+                    with parts_zip.open(info) as src, self.output.open(info.filename, "w") as dst:
+                        shutil.copyfileobj(src, dst)
+        for rId, reltype, name, source_name in self.added_rels:
+            etree.SubElement(rels, "{%s}Relationship" % RELS_NS,
+                             Id=rId, Type=reltype, Target=posixpath.relpath(name, "word"))
+            content_type = overrides.get("/" + source_name)
+            if content_type is not None:
+                etree.SubElement(content_types, "{%s}Override" % CT_NS, PartName="/" + name, ContentType=content_type)
+        self.output.writestr(CONTENT_TYPES, etree.tostring(content_types, xml_declaration=True,
+                                                           encoding="UTF-8", standalone=True))
+        self.output.writestr(DOCUMENT_RELS, etree.tostring(rels, xml_declaration=True,
+                                                           encoding="UTF-8", standalone=True))
+
+    def abort(self):
+        """出错时放弃合并，删除临时文件"""
+        try:
+            if getattr(self, "stream", None) is not None:
+                self.stream.close()
+            self.output.close()
+            if self.parts_zip is not None:
+                self.parts_zip.close()
+        finally:
+            for path in (self.tmp_path, self.parts_path):
+                if os.path.exists(path):
+                    os.remove(path)
@@ -0,0 +1,148 @@
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+def find_soffice():
+    """查找本机 LibreOffice 的 soffice 可执行文件，找不到返回 None"""
+    for name in ("soffice", "libreoffice"):
+        path = shutil.which(name)
+        if path:
+            return path
+    if sys.platform == "win32":
+        for root in (os.environ.get("ProgramFiles"), os.environ.get("ProgramFiles(x86)")):
+            if root:
+                path = os.path.join(root, "LibreOffice", "program", "soffice.exe")
+                if os.path.exists(path):
+                    return path
+    elif sys.platform == "darwin":
+        path = "/Applications/LibreOffice.app/Contents/MacOS/soffice"
+        if os.path.exists(path):
+            return path
+    return None
+
+class PdfConverter:
+    """无界面 LibreOffice 转换池：每个工作位使用独立且长期保留的用户配置目录
+
+    LibreOffice 同一配置目录只允许一个实例，独立目录使多个 soffice 可以同时运行；
+    配置目录跨批次、跨运行复用，只有第一次需要初始化。每次调用一次转换一批文件，
+    进程启动开销由整批分摊。
+    """
+    batch_size = 50 # 每次调用 soffice 转换的文件数
+    timeout_per_file = 60 # 每个文件的基础超时（秒）
+    timeout_bytes_per_second = 20 * 1024 # 按正文大小放宽超时：正文XML每 20KB 再加 1 秒，含数千个证书的合并文件可达数分钟
+
+    def __init__(self, soffice=None, workers=1, profile_root=None, timeout=None):
+        """timeout 为每批的超时秒数：None 时按文件大小自动计算，0 表示不限时"""
+        self.soffice = soffice or find_soffice()
+        self.workers = max(1, workers or 1)
+        self.profile_root = profile_root or os.path.join(tempfile.gettempdir(), "certmaker_soffice")
+        self.timeout = timeout
+
+    @property
+    def available(self):
+        return self.soffice is not None
+
+    def get_profile_dir(self, slot):
+        return os.path.join(self.profile_root, f"profile_{slot}")
+
+    def get_pdf_path(self, docx_path, pdf_dir):
+        """soffice 输出的PDF文件名与源文件同名"""
+        return os.path.join(pdf_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+
+    def convert_batch(self, docx_paths, pdf_dir, slot):
+        """用指定工作位的 soffice 把一批文件转换为PDF，返回 [(docx路径, pdf路径或None)]"""
+        profile_uri = Path(os.path.abspath(self.get_profile_dir(slot))).as_uri()
+        command = [self.soffice, f"-env:UserInstallation={profile_uri}", "--headless", "--norestore",
+                   "--convert-to", "pdf", "--outdir", pdf_dir] + list(docx_paths)
+        self.run_soffice(command, self.get_timeout(docx_paths))
+        results = []
+        for docx_path in docx_paths:
+            pdf_path = self.get_pdf_path(docx_path, pdf_dir)
+            results.append((docx_path, pdf_path if os.path.exists(pdf_path) else None))
+        return results
+
+    def get_timeout(self, docx_paths):
+        """一批文件的超时秒数：每个文件的基础超时加上按正文XML（未压缩）大小放宽的时间；None 表示不限时"""
+        if self.timeout is not None:
+            return self.timeout or None
+        timeout = 0
+        for docx_path in docx_paths:
+            try:
+                with zipfile.ZipFile(docx_path) as docx_zip:
+                    size = docx_zip.getinfo("word/document.xml").file_size
+            except (OSError, KeyError, zipfile.BadZipFile):
+                size = 0 # 无法读取时由 soffice 报告转换失败
+            timeout += self.timeout_per_file + size / self.timeout_bytes_per_second
+        return timeout
+
+    def run_soffice(self, command, timeout):
+        """运行 soffice；超时或中断时结束整个进程树，避免残留的 soffice.bin 占用该工作位的配置目录"""
+        if sys.platform == "win32":
+            # 不弹出控制台；独立进程组便于整体结束
+            options = {"creationflags": subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            options = {"start_new_session": True} # soffice.bin 与启动脚本同在新的进程组中
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **options)
+        try:
+            process.wait(timeout=timeout)
+        except BaseException:
+            self.kill_process_tree(process)
+            raise
+
+    @staticmethod
+    def kill_process_tree(process):
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           creationflags=subprocess.CREATE_NO_WINDOW)
+        else:
+            import signal # 首次使用时才导入
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        process.wait()
+
+    def iter_convert(self, docx_paths, pdf_dir):
+        """分批并行转换，按完成顺序逐批产出 [(docx路径, pdf路径或None)]；单批出错时整批记为失败"""
+        if not docx_paths:
+            return
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        os.makedirs(pdf_dir, exist_ok=True)
+        batch_size = max(1, min(self.batch_size, -(-len(docx_paths) // self.workers)))
+        batches = [docx_paths[i:i + batch_size] for i in range(0, len(docx_paths), batch_size)]
+        slots = queue.Queue()
+        for slot in range(min(self.workers, len(batches))):
+            slots.put(slot)
+
+        def run(batch):
+            slot = slots.get()
+            try:
+                # 先删除旧的PDF，避免把上次的结果误当作本次成功
+                for docx_path in batch:
+                    pdf_path = self.get_pdf_path(docx_path, pdf_dir)
+                    if os.path.exists(pdf_path):
+                        os.remove(pdf_path)
+                return self.convert_batch(batch, pdf_dir, slot)
+            finally:
+                slots.put(slot)
+
+        with ThreadPoolExecutor(max_workers=slots.qsize()) as executor:
+            futures = {executor.submit(run, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except (OSError, subprocess.SubprocessError):
+                    yield [(docx_path, None) for docx_path in futures[future]]
+
+    def convert(self, docx_paths, pdf_dir):
+        """转换全部文件，返回 {docx路径: pdf路径或None}"""
+        results = {}
+        for batch in self.iter_convert(list(docx_paths), pdf_dir):
+            results.update(batch)
+        return results
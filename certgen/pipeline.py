@@ -0,0 +1,168 @@
+"""生成流水线：读取、渲染、保存、合并各阶段在不同线程中同时进行，阶段之间用有界队列连接
+
+渲染要修改共用的模板文档，只能在一个线程中串行进行；保存阶段的 zip 压缩（zlib）和磁盘写入
+会释放 GIL，可以与渲染重叠。每个队列都有上限（queue_size），下游变慢时上游阻塞等待，
+同时在内存中的渲染结果不超过约 queue_size 份。
+"""
+import queue
+import threading
+
+_DONE = object() # 队列结束标记
+
+
+class _Failure:
+    """阶段线程中的异常，随队列传给消费方后重新抛出"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class RenderPipeline:
+    """读取 → 渲染 → 保存 三个阶段并发执行，按任务顺序产出结果
+
+    render(task) 返回 (结果, 待保存的数据)，待保存的数据为 None 时跳过保存；
+    save(结果, 待保存的数据) 返回最终结果。两者都应自行处理单行错误，抛出的异常会终止整批。
+    """
+
+    def __init__(self, render, save, queue_size=32, save_threads=2):
+        self.render = render
+        self.save = save
+        self.queue_size = max(1, queue_size)
+        self.save_threads = max(1, save_threads)
+        self.stopped = threading.Event()
+
+    def put(self, q, item):
+        """放入队列，队列已满时等待；流水线停止后放弃，返回是否放入"""
+        while not self.stopped.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, q):
+        while not self.stopped.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def read_stage(self, tasks, task_queue):
+        try:
+            for seq, task in enumerate(tasks):
+                if not self.put(task_queue, (seq, task)):
+                    return
+        except BaseException as e:
+            self.put(task_queue, _Failure(e))
+        self.put(task_queue, _DONE)
+
+    def render_stage(self, task_queue, save_queue):
+        while True:
+            item = self.get(task_queue)
+            if item is _DONE or isinstance(item, _Failure):
+                break
+            seq, task = item
+            try:
+                item = (seq,) + tuple(self.render(task))
+            except BaseException as e:
+                item = _Failure(e)
+                break
+            if not self.put(save_queue, item):
+                return
+        if isinstance(item, _Failure):
+            self.put(save_queue, item)
+        for _ in range(self.save_threads):
+            self.put(save_queue, _DONE)
+
+    def save_stage(self, save_queue, done_queue):
+        while True:
+            item = self.get(save_queue)
+            if item is _DONE or isinstance(item, _Failure):
+                self.put(done_queue, item)
+                if item is _DONE:
+                    return
+                continue
+            seq, result, payload = item
+            try:
+                if payload is not None:
+                    result = self.save(result, payload)
+            except BaseException as e:
+                self.put(done_queue, _Failure(e))
+                continue
+            if not self.put(done_queue, (seq, result)):
+                return
+
+    def run(self, tasks):
+        """按任务顺序产出结果；中途停止迭代时通知各阶段线程退出"""
+        task_queue = queue.Queue(self.queue_size)
+        save_queue = queue.Queue(self.queue_size)
+        done_queue = queue.Queue(self.queue_size)
+        threads = [threading.Thread(target=self.read_stage, args=(tasks, task_queue), daemon=True),
+                   threading.Thread(target=self.render_stage, args=(task_queue, save_queue), daemon=True)]
+        threads += [threading.Thread(target=self.save_stage, args=(save_queue, done_queue), daemon=True)
+                    for _ in range(self.save_threads)]
+        for thread in threads:
+            thread.start()
+
+        reorder = {} # 保存线程完成顺序不定，先到的结果暂存，按序号依次产出
+        next_seq = 0
+        finished_savers = 0
+        try:
+            while finished_savers < self.save_threads:
+                item = done_queue.get()
+                if item is _DONE:
+                    finished_savers += 1
+                    continue
+                if isinstance(item, _Failure):
+                    raise item.error
+                seq, result = item
+                reorder[seq] = result
+                while next_seq in reorder:
+                    yield reorder.pop(next_seq)
+                    next_seq += 1
+        finally:
+            self.stopped.set()
+            for thread in threads:
+                thread.join()
+
+
+class MergeStage:
+    """合并阶段：在单独线程中按顺序处理已保存的证书，与生成同时进行
+
+    append(path) 在合并线程中逐个调用，应自行处理单个文件的错误；抛出的异常会终止合并，
+    并在 close() 时重新抛出。
+    """
+
+    def __init__(self, append, queue_size=32):
+        self.append = append
+        self.queue = queue.Queue(max(1, queue_size))
+        self.error = None
+        self.cancelled = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            path = self.queue.get()
+            if path is _DONE:
+                return
+            if self.error is not None or self.cancelled:
+                continue # 已出错或已取消，只清空队列，不再合并
+            try:
+                self.append(path)
+            except BaseException as e:
+                self.error = e
+
+    def put(self, path):
+        """提交一个已保存的证书；合并落后时阻塞，限制排队的数量"""
+        self.queue.put(path)
+
+    def close(self, cancel=False):
+        """等待合并线程处理完全部证书，合并出错时抛出异常；cancel=True 时丢弃尚未合并的证书"""
+        self.cancelled = cancel
+        self.queue.put(_DONE)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
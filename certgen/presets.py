@@ -0,0 +1,41 @@
+import json
+
+# 预设配置数据（GUI 下拉框与命令行 --preset 共用）
+PRESETS = {
+    "就业创业培训": [
+        {"excel_header": "姓名", "placeholder": "湖小招", "format": "{0}", "required": True, "use_in_filename": True},
+        {"excel_header": "学号", "placeholder": "14242300000", "format": "{0}", "required": True, "use_in_filename": True},
+        {"excel_header": "项目", "placeholder": "XXXX", "format": "{0}", "required": True, "use_in_filename": False},
+        {"excel_header": "学时", "placeholder": "（学时）", "format": "（{0}学时）", "required": True, "use_in_filename": False},
+    ],
+    "职业规划大赛": [
+        {"excel_header": "姓名", "placeholder": "湖小招", "format": "{0}", "required": True, "use_in_filename": True},
+        {"excel_header": "赛道", "placeholder": "XXXX", "format": "{0}", "required": True, "use_in_filename": False},
+        {"excel_header": "奖项", "placeholder": "特等奖", "format": "{0}", "required": True, "use_in_filename":False},
+        {"excel_header": "指导老师", "placeholder": "指导老师：", "format": "指导老师：{0}", "required": False, "use_in_filename": False},
+        {"excel_header": "团队成员", "placeholder": "团队成员：", "format": "团队成员：{0}", "required": False, "use_in_filename": False}
+    ],
+    "金种子": [
+        {"excel_header": "项目名称", "placeholder": "AAA", "format": "{0}", "required": True, "use_in_filename": True},
+        {"excel_header": "赛道", "placeholder": "XXXX", "format": "{0}", "required": True, "use_in_filename": False},
+        {"excel_header": "奖项", "placeholder": "特等奖", "format": "{0}", "required": True, "use_in_filename": False},
+        {"excel_header": "团队成员", "placeholder": "团队成员：", "format": "团队成员：{0}", "required": True, "use_in_filename": False},
+        {"excel_header": "指导老师", "placeholder": "指导老师：", "format": "指导老师：{0}", "required": False, "use_in_filename": False}
+    ],
+    "自定义": []  # 初始为空，用户自定义时保存
+}
+
+
+def load_config_file(filename):
+    """读取导出的配置文件（export_config 的 JSON 格式）并校验必要字段"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        configs = json.load(f)
+
+    # 验证配置格式
+    if not isinstance(configs, list):
+        raise ValueError("配置文件格式不正确")
+    for config in configs:
+        # 验证必要字段
+        if not isinstance(config, dict) or not all(key in config for key in ["excel_header", "placeholder"]):
+            raise ValueError("配置文件缺少必要字段")
+    return configs
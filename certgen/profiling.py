@@ -0,0 +1,126 @@
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Instrumentation:
+    """插桩接口：DocumentGenerator 在各阶段调用这些方法，默认实现什么都不做
+
+    阶段名称：load_template（加载模板）、filename（生成文件名）、substitute（替换占位符）、
+    serialize（流水线模式下序列化证书）、save（保存证书）、merge_append（追加到合并文件）、
+    dedupe_media（合并文件图片去重）。
+    """
+    enabled = False
+
+    @contextmanager
+    def stage(self, name, row=None, detail=None):
+        """统计一个阶段的耗时；row 为数据行序号，detail 为附加说明（如文件名）"""
+        yield
+
+    def add_records(self, records):
+        """并入其他进程记录的阶段耗时"""
+
+    def start_run(self):
+        """一次完整运行开始"""
+
+    def finish_run(self):
+        """一次完整运行结束"""
+
+
+class TraceRecorder(Instrumentation):
+    """逐行记录各阶段耗时，可选 cProfile / tracemalloc，运行结束后导出 JSON 或 CSV
+
+    trace_path 以 .csv 结尾时导出逐条记录的 CSV，否则导出包含汇总的 JSON。
+    开启 profile 时另存 cProfile 统计到 trace_path + ".prof"；开启 trace_memory 时
+    在 JSON 中附上分配最多的代码行。两者只统计当前进程，并行模式下子进程的耗时仍会记录。
+    """
+    enabled = True
+
+    def __init__(self, trace_path=None, profile=False, trace_memory=False, memory_top=20,
+                 clock=time.perf_counter):
+        self.trace_path = trace_path
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.memory_top = memory_top
+        self.clock = clock
+        self.records = []
+        self.profiler = None
+        self.memory_stats = []
+        self.run_seconds = None
+        self._run_start = None
+
+    @contextmanager
+    def stage(self, name, row=None, detail=None):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.records.append({"row": row, "stage": name, "seconds": self.clock() - start, "detail": detail})
+
+    def add_records(self, records):
+        self.records.extend(records)
+
+    def start_run(self):
+        self.records = []
+        self.memory_stats = []
+        self._run_start = self.clock()
+        if self.profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+
+    def finish_run(self):
+        if self._run_start is not None:
+            self.run_seconds = self.clock() - self._run_start
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.trace_memory:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                self.memory_stats = [{"location": str(stat.traceback), "size_kb": round(stat.size / 1024, 1),
+                                      "count": stat.count}
+                                     for stat in snapshot.statistics("lineno")[:self.memory_top]]
+                tracemalloc.stop()
+        if self.trace_path:
+            self.export(self.trace_path)
+
+    def summary(self):
+        """按阶段汇总：次数、总耗时、平均、最大，以及最慢的数据行"""
+        stages = defaultdict(list)
+        for record in self.records:
+            stages[record["stage"]].append(record)
+        summary = {}
+        for name, records in stages.items():
+            seconds = [record["seconds"] for record in records]
+            slowest = max(records, key=lambda record: record["seconds"])
+            summary[name] = {"count": len(records), "total": sum(seconds), "mean": sum(seconds) / len(seconds),
+                             "max": slowest["seconds"], "slowest_row": slowest["row"],
+                             "slowest_detail": slowest["detail"]}
+        return summary
+
+    def export(self, path):
+        """导出记录：.csv 为逐条记录，其余为 JSON（含汇总）"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.DictWriter(f, fieldnames=["row", "stage", "seconds", "detail"])
+                writer.writeheader()
+                writer.writerows(self.records)
+        else:
+            trace = {"run_seconds": self.run_seconds, "summary": self.summary(), "records": self.records}
+            if self.memory_stats:
+                trace["memory_top"] = self.memory_stats
+            if self.profiler is not None:
+                trace["profile"] = path + ".prof"
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(trace, f, ensure_ascii=False, indent=1)
+        if self.profiler is not None:
+            self.profiler.dump_stats(path + ".prof")
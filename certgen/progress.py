@@ -0,0 +1,68 @@
+import time
+
+
+class ProgressReporter:
+    """进度汇总器：逐行计数只做 O(1) 的累加，按固定刷新间隔向外上报一次结构化进度
+
+    上报内容为字典：stage（阶段）、done（完成数）、failed（失败数）、total（总数，未知时为 None）、
+    elapsed（已用秒数）、rate（个/秒）、eta（预计剩余秒数，未知时为 None）、finished（阶段是否结束）。
+    """
+
+    def __init__(self, callback=None, interval=0.2, clock=time.monotonic):
+        self.callback = callback
+        self.interval = interval # 刷新间隔（秒）
+        self.clock = clock
+        self.start("", None)
+
+    def start(self, stage, total=None):
+        """开始一个新阶段（如“生成”“合并”）"""
+        self.stage = stage
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started_at = self.clock()
+        self.last_emit = self.started_at
+        self.emit()
+
+    def advance(self, ok=True):
+        """记录一行完成（ok=False 记为失败），到了刷新时间才上报"""
+        if ok:
+            self.done += 1
+        else:
+            self.failed += 1
+        now = self.clock()
+        if now - self.last_emit >= self.interval:
+            self.last_emit = now
+            self.emit(now)
+
+    def finish(self):
+        """阶段结束，立即上报最终进度"""
+        self.emit(finished=True)
+
+    def snapshot(self, now=None, finished=False):
+        now = self.clock() if now is None else now
+        elapsed = now - self.started_at
+        processed = self.done + self.failed
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = max(self.total - processed, 0) / rate
+        return {"stage": self.stage, "done": self.done, "failed": self.failed, "total": self.total,
+                "elapsed": elapsed, "rate": rate, "eta": eta, "finished": finished}
+
+    def emit(self, now=None, finished=False):
+        if self.callback is not None:
+            self.callback(self.snapshot(now, finished))
+
+
+def format_progress(progress):
+    """把进度字典格式化为一行中文提示"""
+    if progress["total"]:
+        text = f"{progress['stage']} {progress['done'] + progress['failed']}/{progress['total']}"
+    else:
+        text = f"{progress['stage']} {progress['done'] + progress['failed']}"
+    text += f"，失败 {progress['failed']}，速度 {progress['rate']:.1f} 个/秒"
+    if progress["eta"] is not None and not progress["finished"]:
+        minutes, seconds = divmod(int(progress["eta"]), 60)
+        text += f"，剩余约 {minutes:02d}:{seconds:02d}"
+    return text
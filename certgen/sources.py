@@ -0,0 +1,131 @@
+"""数据来源：Excel 工作表、CSV 文件、SQLite 数据库
+
+每种来源只负责打开文件并逐行产出原始单元格值（第一行为表头）；表头校验、必填字段检查
+和单元格取值由 DocumentGenerator.iter_sheet_rows 统一完成，各来源行为一致。
+CSV 和 SQLite 都是边读边产出，不解析 xlsx；配合 stream_rows 可以边读边生成，适合从报名系统导出的大表。
+"""
+import codecs
+import os
+from pathlib import Path
+
+CSV_EXTENSIONS = (".csv", ".tsv")
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+class RowSource:
+    """数据来源接口：iter_rows 为生成器，先产出表头，再逐行产出单元格值；关闭生成器时释放文件"""
+
+    def __init__(self, path):
+        self.path = path
+        self.description = path # 打开后由各来源补充（如工作表名），用于状态提示
+
+    def iter_rows(self):
+        raise NotImplementedError
+
+
+class ExcelSource(RowSource):
+    """Excel 工作表（openpyxl 只读模式）；sheet 为 None 时读取活动工作表"""
+
+    def __init__(self, path, sheet=None):
+        super().__init__(path)
+        self.sheet = sheet
+
+    def iter_rows(self):
+        from openpyxl import load_workbook # 首次使用时才导入
+        workbook = load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            if self.sheet and self.sheet not in workbook.sheetnames:
+                raise ValueError(f"Excel中没有工作表「{self.sheet}」")
+            sheet = workbook[self.sheet] if self.sheet else workbook.active
+            self.description = f"{self.path}（工作表名：{sheet.title}）"
+            yield from sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+
+class CsvSource(RowSource):
+    """CSV 文件，逐行读取
+
+    encoding 为 None 时先按 UTF-8（可带 BOM）读取，文件开头不是合法 UTF-8 时改用 GB18030
+    （Excel 在中文 Windows 上“另存为 CSV”的默认编码）。分隔符按扩展名选择：.tsv 为制表符，其余为逗号。
+    """
+    probe_size = 64 * 1024 # 判断编码时读取的字节数
+
+    def __init__(self, path, encoding=None, delimiter=None):
+        super().__init__(path)
+        self.encoding = encoding
+        self.delimiter = delimiter or ("\t" if path.lower().endswith(".tsv") else ",")
+
+    def detect_encoding(self):
+        with open(self.path, "rb") as f:
+            head = f.read(self.probe_size)
+        try:
+            # 增量解码器不会因截断在多字节字符中间而报错
+            codecs.getincrementaldecoder("utf-8-sig")().decode(head)
+            return "utf-8-sig"
+        except UnicodeDecodeError:
+            return "gb18030"
+
+    def iter_rows(self):
+        import csv # 首次使用时才导入
+        encoding = self.encoding or self.detect_encoding()
+        with open(self.path, "r", encoding=encoding, newline="") as f:
+            self.description = f"{self.path}（CSV，编码：{encoding}）"
+            yield from csv.reader(f, delimiter=self.delimiter)
+
+
+class SqliteSource(RowSource):
+    """SQLite 数据库，以只读方式打开，按批从游标读取
+
+    query 为自定义 SQL；否则读取 table 整张表；两者都未指定且库中只有一张表时读取该表。
+    """
+    batch_size = 1000
+
+    def __init__(self, path, table=None, query=None):
+        super().__init__(path)
+        self.table = table
+        self.query = query
+
+    def resolve_query(self, connection):
+        if self.query:
+            return self.query, "自定义查询"
+        tables = [name for (name,) in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+        table = self.table
+        if table is None:
+            if len(tables) != 1:
+                raise ValueError(f"数据库中有 {len(tables)} 张表，请指定表名：{tables}")
+            table = tables[0]
+        elif table not in tables:
+            raise ValueError(f"数据库中没有表「{table}」")
+        return 'SELECT * FROM "%s"' % table.replace('"', '""'), f"表名：{table}"
+
+    def iter_rows(self):
+        import sqlite3 # 首次使用时才导入
+        if not os.path.isfile(self.path):
+            # sqlite3 打开不存在的文件时会新建空库，这里与其他来源一致地报告文件不存在
+            raise FileNotFoundError(self.path)
+        uri = Path(os.path.abspath(self.path)).as_uri() + "?mode=ro"
+        connection = sqlite3.connect(uri, uri=True)
+        try:
+            query, label = self.resolve_query(connection)
+            cursor = connection.execute(query)
+            self.description = f"{self.path}（{label}）"
+            yield [column[0] for column in cursor.description]
+            while True:
+                batch = cursor.fetchmany(self.batch_size)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            connection.close()
+
+
+def open_row_source(path, sheet=None, query=None):
+    """按扩展名选择数据来源：.csv/.tsv 为 CSV，.db/.sqlite/.sqlite3 为 SQLite（sheet 为表名），其余为 Excel"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in CSV_EXTENSIONS:
+        return CsvSource(path)
+    if ext in SQLITE_EXTENSIONS:
+        return SqliteSource(path, table=sheet, query=query)
+    return ExcelSource(path, sheet)
@@ -0,0 +1,196 @@
+import re
+from io import BytesIO
+from contextlib import contextmanager
+
+def iter_document_paragraphs(document):
+    """遍历文档中所有含文字的段落，每个段落只访问一次
+
+    覆盖正文（含嵌套表格、文本框、内容控件）以及各节的页眉页脚；
+    页眉页脚按part去重，沿用前一节的不会重复访问，也不会因访问而新建。
+    """
+    from docx.text.paragraph import Paragraph # 首次使用时才导入
+    body = document._body
+    for p in body._element.xpath(".//w:p"):
+        yield Paragraph(p, body)
+
+    seen_parts = set()
+    for section in document.sections:
+        for header_footer in (section.header, section.first_page_header, section.even_page_header,
+                              section.footer, section.first_page_footer, section.even_page_footer):
+            if header_footer.is_linked_to_previous:
+                continue
+            part = header_footer.part
+            if part in seen_parts:
+                continue
+            seen_parts.add(part)
+            for p in part.element.xpath(".//w:p"):
+                yield Paragraph(p, header_footer)
+
+class PlaceholderMatcher:
+    """把 replacement_config 编译为一个正则（按配置顺序的多选分支），每段文本只扫描一次"""
+
+    def __init__(self, replacement_config):
+        # 同一占位符出现多次时以第一条配置为准（与逐条 str.replace 的结果一致）
+        self.configs = {}
+        for config in replacement_config:
+            if config["placeholder"]:
+                self.configs.setdefault(config["placeholder"], config)
+        self.pattern = re.compile("|".join(re.escape(ph) for ph in self.configs)) if self.configs else None
+
+    def search(self, text):
+        """文本中是否包含任意占位符"""
+        return self.pattern is not None and self.pattern.search(text) is not None
+
+    def row_values(self, row_data):
+        """预先计算一行数据中每个占位符的替换结果：空值删除占位符，非空按format格式化"""
+        values = {}
+        for placeholder, config in self.configs.items():
+            cell_value = row_data.get(config["excel_header"], "")
+            values[placeholder] = config.get("format", "{0}").format(cell_value) if cell_value else ""
+        return values
+
+    def substitute(self, text, values):
+        """单次扫描替换全部占位符"""
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(lambda match: values[match.group(0)], text)
+
+    def join_split_runs(self, paragraph):
+        """把跨多个run的占位符整体移入第一个run（沿用其格式），其余run删去对应字符
+
+        与数据无关，只需对模板做一次；之后按run替换即可命中。返回是否有改动。
+        """
+        if self.pattern is None:
+            return False
+        runs = paragraph.runs
+        texts = [run.text for run in runs]
+        if len(texts) < 2:
+            return False
+        joined = "".join(texts)
+        owners = [i for i, text in enumerate(texts) for _ in text]  # 每个字符所属的run
+        changed = False
+        for match in self.pattern.finditer(joined):
+            first = owners[match.start()]
+            if owners[match.end() - 1] == first:
+                continue  # 占位符完整位于一个run内
+            owners[match.start():match.end()] = [first] * (match.end() - match.start())
+            changed = True
+        if not changed:
+            return False
+
+        new_texts = [[] for _ in texts]
+        for char, owner in zip(joined, owners):
+            new_texts[owner].append(char)
+        for run, text, new_text in zip(runs, texts, new_texts):
+            new_text = "".join(new_text)
+            if new_text != text:
+                run.text = new_text
+        return True
+
+class CompiledTemplate:
+    """预编译模板：模板只解析一次，记录含占位符的run，逐行打补丁后输出"""
+
+    def __init__(self, template_file, matcher):
+        self.template_file = template_file
+        self.matcher = matcher
+        from docx import Document # 首次使用时才导入
+        self.document = Document(template_file)
+
+        # 完整遍历只做一次，记录含占位符的run；合并单元格、共用的页眉页脚都只出现一次
+        # 跨run的占位符在此一次性归并到首个run，逐行替换时无需再跨run匹配
+        self.visits = [] # 含占位符的 w:r 元素
+        self.original_texts = {}
+        self.found_placeholders = set() # 模板中实际出现的占位符，供预检使用
+        for paragraph in iter_document_paragraphs(self.document):
+            if not paragraph.text.strip():
+                continue
+            matcher.join_split_runs(paragraph)
+            for run in paragraph.runs:
+                run_text = run.text
+                if run_text and matcher.search(run_text):
+                    self.visits.append(run._r)
+                    self.original_texts[run._r] = run_text
+                    self.found_placeholders.update(matcher.pattern.findall(run_text))
+
+    @property
+    def header_footer_placeholders(self):
+        """页眉页脚中是否含占位符（此时每个证书的页眉页脚内容不同）"""
+        from docx.oxml.ns import qn
+        return any(r.getroottree().getroot().tag in (qn("w:hdr"), qn("w:ftr")) for r in self.visits)
+
+    @staticmethod
+    def iter_part_runs(document):
+        """按部件产出 (部件名, 部件中全部 w:r 元素的列表)，用于记录和还原run的位置"""
+        from docx.oxml.ns import qn
+        for part in document.part.package.iter_parts():
+            element = getattr(part, "element", None) # 只有XML部件有 element
+            if element is not None:
+                yield str(part.partname), list(element.iter(qn("w:r")))
+
+    def export_index(self):
+        """导出可写入磁盘缓存的内容：(已归并跨run占位符的模板文件内容, run位置记录, 出现的占位符)"""
+        positions = {}
+        for partname, runs in self.iter_part_runs(self.document):
+            for run_index, r in enumerate(runs):
+                positions[r] = (partname, run_index)
+        runs = [list(positions[r]) + [self.original_texts[r]] for r in self.visits]
+        document_file = BytesIO()
+        self.document.save(document_file)
+        return document_file.getvalue(), runs, sorted(self.found_placeholders)
+
+    @classmethod
+    def from_index(cls, template_file, matcher, document_bytes, runs, found_placeholders):
+        """由 export_index 的结果重建，按记录直接定位run，不再遍历和匹配整个文档；记录与文档不符时返回 None"""
+        from docx import Document # 首次使用时才导入
+        template = cls.__new__(cls)
+        template.template_file = template_file
+        template.matcher = matcher
+        template.document = Document(BytesIO(document_bytes))
+        part_runs = dict(cls.iter_part_runs(template.document))
+        template.visits = []
+        template.original_texts = {}
+        for partname, run_index, run_text in runs:
+            part = part_runs.get(partname)
+            if part is None or run_index >= len(part) or part[run_index].text != run_text:
+                return None
+            r = part[run_index]
+            template.visits.append(r)
+            template.original_texts[r] = run_text
+        template.found_placeholders = set(found_placeholders)
+        return template
+
+    def apply(self, row_data):
+        """把一行数据写入模板文档，返回 restore 所需的原始子节点"""
+        values = self.matcher.row_values(row_data)
+        changed = []
+        for r in self.visits:
+            run_text = self.original_texts[r]
+            new_run_text = self.matcher.substitute(run_text, values)
+            if new_run_text != run_text:
+                changed.append((r, new_run_text))
+
+        saved_children = []
+        try:
+            for r, new_run_text in changed:
+                saved_children.append((r, list(r)))
+                r.text = new_run_text
+        except Exception:
+            self.restore(saved_children)
+            raise
+        return saved_children
+
+    def restore(self, saved_children):
+        """还原原始子节点（含rPr），保证下一行从干净的模板开始"""
+        for r, children in saved_children:
+            for child in list(r):
+                r.remove(child)
+            r.extend(children)
+
+    @contextmanager
+    def patched(self, row_data):
+        """把一行数据临时写入模板文档，退出时恢复被修改的run"""
+        saved_children = self.apply(row_data)
+        try:
+            yield self.document
+        finally:
+            self.restore(saved_children)
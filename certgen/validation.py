@@ -0,0 +1,77 @@
+class PreflightReport:
+    """预检结果：生成前对整张表一次性校验，汇总所有问题后统一报告
+
+    错误（ok 为 False）：必填字段为空（该行会被跳过）、输出文件名重复（后一行覆盖前一行）、
+    命名字段全为空、配置中的占位符在模板中找不到。
+    提示：文件名中的非法字符会被替换为下划线。
+    """
+    max_listed = 20 # 每类问题最多逐条列出的数量，其余只计数
+
+    def __init__(self):
+        self.total_rows = 0
+        self.incomplete_rows = [] # [(行号, [为空的必填字段])]
+        self.filename_rows = {} # {不区分大小写的文件名: [(行号, 文件名)]}
+        self.empty_filename_rows = [] # [行号]
+        self.renamed_rows = [] # [(行号, 原文件名, 清理后的文件名)]
+        self.missing_placeholders = [] # [(表头, 占位符)]
+
+    def check_template(self, matcher, found_placeholders):
+        """记录配置了但模板中不存在的占位符"""
+        for placeholder, config in matcher.configs.items():
+            if placeholder not in found_placeholders:
+                self.missing_placeholders.append((config["excel_header"], placeholder))
+
+    def add_row(self, row_num, required_empty, raw_filename, filename):
+        """记录一行；只做 O(1) 的登记，重复文件名在 duplicate_filenames 中统一分组"""
+        self.total_rows += 1
+        if required_empty:
+            self.incomplete_rows.append((row_num, required_empty))
+            return
+        if filename == ".docx":
+            self.empty_filename_rows.append(row_num)
+            return
+        if raw_filename != filename:
+            self.renamed_rows.append((row_num, raw_filename, filename))
+        # Windows 文件名不区分大小写，按 casefold 分组
+        self.filename_rows.setdefault(filename.casefold(), []).append((row_num, filename))
+
+    @property
+    def duplicate_filenames(self):
+        """{文件名: [行号]}，只包含出现多次的文件名"""
+        return {rows[0][1]: [row_num for row_num, _ in rows]
+                for rows in self.filename_rows.values() if len(rows) > 1}
+
+    @property
+    def ok(self):
+        return not (self.incomplete_rows or self.empty_filename_rows or self.missing_placeholders
+                    or self.duplicate_filenames)
+
+    def listed(self, items):
+        """最多列出 max_listed 条，超出部分附加“等 N 处”"""
+        shown = "；".join(items[:self.max_listed])
+        if len(items) > self.max_listed:
+            shown += f"；等共 {len(items)} 处"
+        return shown
+
+    def messages(self):
+        """按问题类别汇总的报告文字"""
+        lines = [f"预检 {self.total_rows} 行数据："]
+        if self.missing_placeholders:
+            lines.append("❌ 模板中找不到的占位符：" + self.listed(
+                [f"「{placeholder}」（表头：{header}）" for header, placeholder in self.missing_placeholders]))
+        if self.incomplete_rows:
+            lines.append(f"❌ 必填字段为空（将被跳过）{len(self.incomplete_rows)} 行：" + self.listed(
+                [f"第{row_num}行{fields}" for row_num, fields in self.incomplete_rows]))
+        duplicates = self.duplicate_filenames
+        if duplicates:
+            overwritten = sum(len(rows) - 1 for rows in duplicates.values())
+            lines.append(f"❌ 文件名重复（将互相覆盖，丢失 {overwritten} 个证书）：" + self.listed(
+                [f"{filename}（第{'、'.join(map(str, rows))}行）" for filename, rows in duplicates.items()]))
+        if self.empty_filename_rows:
+            lines.append(f"❌ 命名字段全部为空 {len(self.empty_filename_rows)} 行：" + self.listed(
+                [f"第{row_num}行" for row_num in self.empty_filename_rows]))
+        if self.renamed_rows:
+            lines.append(f"提示：{len(self.renamed_rows)} 个文件名含非法字符，将替换为下划线：" + self.listed(
+                [f"第{row_num}行 {raw} → {filename}" for row_num, raw, filename in self.renamed_rows]))
+        lines.append("✅ 预检通过" if self.ok else "预检发现问题，请修正后再生成")
+        return lines
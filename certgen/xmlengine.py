@@ -0,0 +1,105 @@
+"""XML 渲染引擎：不经过 python-docx 的对象模型，直接拼接字节生成证书
+
+模板只处理一次：在预编译模板中把每个含占位符的run的内容换成编号标记，序列化全部部件后
+按标记把 XML 切成静态字节段和插槽。不含插槽的部件（样式、主题、图片等）只压缩一次。
+每个证书只需替换插槽文本、拼接字节并压缩含插槽的部件，然后写出 zip。
+"""
+import re
+import time
+
+from .media import serialize_document, compress_member, write_zip
+
+_MARKER = "\ue000%d\ue001" # 私用区字符包围的插槽编号，不会出现在正常文本中
+_SLOT_PATTERN = re.compile(rb"<w:t>\xee\x80\x80(\d+)\xee\x80\x81</w:t>")
+_RUN_BREAKS = re.compile(r"([\t\n\r])")
+_EMPTY_RUN = re.compile(rb"(<w:r(?: [^>]*)?)></w:r>") # 插槽替换为空后留下的空run；lxml 序列化时写为自闭合标签
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+def escape(text):
+    """转义文本中的 &、<、>（与 xml.sax.saxutils.escape 相同；该模块会连带导入 urllib、email 等）"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def run_content_xml(text):
+    """run 内容的 XML，与 python-docx 设置 run.text 的结果一致：制表符为 w:tab，换行为 w:br"""
+    if _INVALID_XML_CHARS.search(text):
+        raise ValueError("All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters")
+    chunks = []
+    for piece in _RUN_BREAKS.split(text):
+        if not piece:
+            continue
+        if piece == "\t":
+            chunks.append("<w:tab/>")
+        elif piece in "\n\r":
+            chunks.append("<w:br/>")
+        elif len(piece.strip()) < len(piece):
+            chunks.append('<w:t xml:space="preserve">%s</w:t>' % escape(piece))
+        else:
+            chunks.append("<w:t>%s</w:t>" % escape(piece))
+    return "".join(chunks).encode("utf-8")
+
+class XmlTemplate:
+    """由 CompiledTemplate 切分得到的字节模板；模板结构不支持时构造函数抛出 ValueError"""
+
+    def __init__(self, compiled_template, media_compression="deflate"):
+        from docx.oxml import OxmlElement # 首次使用时才导入
+        from docx.oxml.ns import qn
+        self.matcher = compiled_template.matcher
+        self.timestamp = time.time()
+        r_pr = qn("w:rPr")
+
+        # 临时把每个含占位符的run的内容换成标记，序列化后立即还原
+        saved_children = []
+        try:
+            for slot, r in enumerate(compiled_template.visits):
+                saved_children.append((r, list(r)))
+                for child in list(r):
+                    if child.tag != r_pr:
+                        r.remove(child)
+                t = OxmlElement("w:t")
+                t.text = _MARKER % slot
+                r.append(t)
+            members = serialize_document(compiled_template.document)
+        finally:
+            compiled_template.restore(saved_children)
+
+        self.slot_texts = [compiled_template.original_texts[r] for r in compiled_template.visits]
+        self.media_compression = media_compression
+        # 静态部件预先压缩为 zip 条目；含插槽的部件在对应位置留空，记录 (位置, 部件名, 静态字节段, 插槽编号)
+        self.entries = []
+        self.dynamic_parts = []
+        found = []
+        for name, blob in members:
+            pieces = _SLOT_PATTERN.split(blob)
+            if len(pieces) == 1:
+                self.entries.append(compress_member(name, blob, media_compression))
+                continue
+            slots = [int(slot) for slot in pieces[1::2]]
+            found.extend(slots)
+            self.dynamic_parts.append((len(self.entries), name, pieces[0::2], slots))
+            self.entries.append(None)
+        if sorted(found) != list(range(len(self.slot_texts))):
+            raise ValueError("模板中含占位符的run嵌套或命名空间前缀不标准，无法按字节切分")
+
+    def render(self, row_data):
+        """替换插槽，返回每个含插槽部件拼接后的 XML 字节（与 dynamic_parts 一一对应）"""
+        values = self.matcher.row_values(row_data)
+        substitute = self.matcher.substitute
+        blobs = []
+        for _, _, segments, slots in self.dynamic_parts:
+            chunks = [segments[0]]
+            empty = False
+            for slot, segment in zip(slots, segments[1:]):
+                content = run_content_xml(substitute(self.slot_texts[slot], values))
+                empty = empty or not content
+                chunks.append(content)
+                chunks.append(segment)
+            blob = b"".join(chunks)
+            blobs.append(_EMPTY_RUN.sub(rb"\1/>", blob) if empty else blob)
+        return blobs
+
+    def write(self, path, blobs):
+        """压缩 render 得到的部件，与预先压缩好的静态部件一起写出证书文件"""
+        entries = list(self.entries)
+        for (position, name, _, _), blob in zip(self.dynamic_parts, blobs):
+            entries[position] = compress_member(name, blob, self.media_compression)
+        write_zip(path, entries, self.timestamp)
@@ -0,0 +1,123 @@
+"""生成与合并的端到端测试：各种并发方式的结果应与串行生成一致"""
+import os
+import zipfile
+
+import pytest
+
+docx = pytest.importorskip("docx")
+
+from certgen.generator import DocumentGenerator
+
+REPLACEMENT_CONFIG = [
+    {"placeholder": "{{姓名}}", "excel_header": "姓名", "use_in_filename": True},
+    {"placeholder": "{{科目}}", "excel_header": "科目"},
+]
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    document = docx.Document()
+    document.add_paragraph("兹证明 {{姓名}} 同学完成 {{科目}}")
+    document.save(tmp_path / "template.docx")
+    # 多行共用两个文件名（大小写不同也算同名），后面的行覆盖前面的行
+    with open(tmp_path / "data.csv", "w", encoding="utf-8") as f:
+        f.write("姓名,科目\n")
+        for i in range(60):
+            f.write(f"{'同名' + 'Aa'[i % 2] if i % 3 else '同名a'},项目{i}\n")
+    return tmp_path
+
+
+def generate(workspace, name, **options):
+    output_dir = workspace / name
+    generator = DocumentGenerator(str(workspace / "data.csv"), str(workspace / "template.docx"), str(output_dir),
+                                  str(workspace / f"{name}.docx"), REPLACEMENT_CONFIG, **options)
+    generator.chunk_size = 2
+    messages = []
+    assert generator.generate_and_merge(messages.append, merge=True) == 0, messages
+    assert not [m for m in messages if "出错" in m or "失败" in m]
+    documents = {}
+    for filename in sorted(os.listdir(output_dir)):
+        with zipfile.ZipFile(output_dir / filename) as docx_zip:
+            assert docx_zip.testzip() is None
+            documents[filename] = docx_zip.read("word/document.xml")
+    merged = [p.text for p in docx.Document(str(workspace / f"{name}.docx")).paragraphs if p.text]
+    return documents, merged
+
+
+@pytest.mark.parametrize("options", [
+    {"workers": 3},
+    {"pipeline": True},
+    {"pipeline": True, "merge_engine": "fast"},  # 合并与生成同时进行
+    {"pipeline": True, "merge_engine": "stream"},
+    {"workers": 3, "pipeline": True, "merge_engine": "fast"},
+])
+def test_duplicate_filenames_match_serial(workspace, options):
+    serial = generate(workspace, "serial")
+    assert generate(workspace, "concurrent", **options) == serial
+
+
+@pytest.mark.parametrize("options", [{"merge_engine": "fast"}, {"pipeline": True, "merge_engine": "stream"},
+                                     {"direct_merge": True, "merge_engine": "fast"}])
+def test_stream_read_error_fails_run(workspace, monkeypatch, options):
+    # 编码按文件开头判断，之后出现的非 UTF-8 字节在读取中途才报错
+    monkeypatch.setattr("certgen.sources.CsvSource.probe_size", 64)
+    with open(workspace / "data.csv", "wb") as f:
+        f.write("姓名,科目\n".encode("utf-8"))
+        for i in range(600):  # 超过一次解码的缓冲区，出错前已产出部分数据行
+            f.write(f"学生{i},项目{i}\n".encode("utf-8"))
+        f.write("学生x,项目x\n".encode("gb18030"))
+    merge_output = workspace / "merged.docx"
+    generator = DocumentGenerator(str(workspace / "data.csv"), str(workspace / "template.docx"),
+                                  str(workspace / "out"), str(merge_output), REPLACEMENT_CONFIG, stream_rows=True,
+                                  **options)
+    messages = []
+    assert generator.generate_and_merge(messages.append, merge=True) == 1
+    assert any(m.startswith("读取数据库错误") for m in messages)
+    assert not merge_output.exists()
+    if not options.get("direct_merge"):
+        # 已生成的证书和断点日志保留
+        assert 0 < len([name for name in os.listdir(workspace / "out") if name.endswith(".docx")]) < 601
+        assert os.path.exists(workspace / "out" / DocumentGenerator.journal_name)
+
+
+@pytest.mark.parametrize("merge_engine", ["composer", "fast", "stream"])
+def test_unreadable_certificate_is_skipped_when_merging(workspace, merge_engine):
+    generator = DocumentGenerator(str(workspace / "data.csv"), str(workspace / "template.docx"),
+                                  str(workspace / "out"), str(workspace / "merged.docx"), REPLACEMENT_CONFIG,
+                                  merge_engine=merge_engine)
+    generator.generated_files = []
+    for name in ("甲", "乙", "丙"):
+        document = docx.Document(str(workspace / "template.docx"))
+        document.add_paragraph(name)
+        document.save(workspace / "out" / f"{name}.docx")
+        generator.generated_files.append(str(workspace / "out" / f"{name}.docx"))
+    with open(generator.generated_files[1], "wb") as f:
+        f.write(b"not a zip")
+    messages = []
+    assert generator.merge_docx(messages.append)
+    assert generator.merge_fail_count == 1
+    assert any(m.startswith("合并 乙.docx 时出错") for m in messages)
+    texts = [p.text for p in docx.Document(str(workspace / "merged.docx")).paragraphs]
+    assert "甲" in texts and "丙" in texts
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_failed_volume_does_not_abort_other_volumes(workspace, workers):
+    generator = DocumentGenerator(str(workspace / "data.csv"), str(workspace / "template.docx"),
+                                  str(workspace / "out"), str(workspace / "merged.docx"), REPLACEMENT_CONFIG,
+                                  merge_engine="fast", volume_size=2, workers=workers)
+    generator.generated_files = []
+    for i in range(8):
+        path = workspace / "out" / f"证书{i}.docx"
+        docx.Document(str(workspace / "template.docx")).save(path)
+        generator.generated_files.append(str(path))
+    with open(generator.generated_files[2], "wb") as f:  # 第2卷的第一个证书无法读取
+        f.write(b"not a zip")
+    generator.start_journal()
+    messages = []
+    assert generator.merge_docx(messages.append) is None
+    assert any(m.startswith("[第2卷] 合并出错") for m in messages)
+    assert generator.merge_outputs == [generator.get_volume_path(number) for number in (1, 3, 4)]
+    with open(generator.get_journal_path(), encoding="utf-8") as f:
+        journaled = [line for line in f if '"volume"' in line]
+    assert len(journaled) == 3
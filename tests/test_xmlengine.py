@@ -0,0 +1,75 @@
+"""XML 引擎与 python-docx 输出一致性：按字节切分渲染的部件、write_zip 写出的 zip 都应与 python-docx 保存的结果相同"""
+import zipfile
+
+import pytest
+
+docx = pytest.importorskip("docx")
+
+from certgen.template import CompiledTemplate, PlaceholderMatcher
+from certgen.xmlengine import XmlTemplate
+
+REPLACEMENT_CONFIG = [
+    {"placeholder": "{{姓名}}", "excel_header": "姓名"},
+    {"placeholder": "{{奖项}}", "excel_header": "奖项", "format": "荣获{0}"},
+    {"placeholder": "{{编号}}", "excel_header": "编号"},
+]
+
+ROWS = [
+    {"姓名": "张三", "奖项": "一等奖", "编号": "No.001"},
+    {"姓名": "A & B <c> \"d\" 'e'", "奖项": "二等奖\t并列", "编号": "第一行\n第二行"},
+    {"姓名": "  前后空格  ", "奖项": "", "编号": "\r"},
+    {"姓名": "", "奖项": "", "编号": ""},
+]
+
+
+@pytest.fixture
+def template_file(tmp_path):
+    document = docx.Document()
+    document.add_paragraph("兹证明 {{姓名}} 同学")
+    paragraph = document.add_paragraph()
+    paragraph.add_run("{{奖")  # 跨run的占位符
+    paragraph.add_run("项}}").bold = True
+    table = document.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "编号"
+    table.cell(0, 1).text = "{{编号}}"
+    document.sections[0].header.paragraphs[0].text = "证书编号：{{编号}}"
+    document.sections[0].footer.paragraphs[0].text = "静态页脚"
+    path = tmp_path / "template.docx"
+    document.save(path)
+    return str(path)
+
+
+def read_members(path):
+    with zipfile.ZipFile(path) as docx_zip:
+        assert docx_zip.testzip() is None
+        return {info.filename: docx_zip.read(info) for info in docx_zip.infolist()}
+
+
+@pytest.mark.parametrize("row", ROWS)
+def test_xml_engine_matches_python_docx(template_file, tmp_path, row):
+    compiled = CompiledTemplate(template_file, PlaceholderMatcher(REPLACEMENT_CONFIG))
+    xml_template = XmlTemplate(compiled)
+
+    expected_path = tmp_path / "docx.docx"
+    with compiled.patched(row) as document:
+        document.save(expected_path)
+    actual_path = tmp_path / "xml.docx"
+    xml_template.write(str(actual_path), xml_template.render(row))
+
+    expected = read_members(expected_path)
+    actual = read_members(actual_path)
+    assert list(actual) == list(expected)
+    for name in expected:
+        assert actual[name] == expected[name], name
+
+    # 生成的文件能被 python-docx 正常打开
+    rendered = docx.Document(str(actual_path))
+    assert rendered.sections[0].footer.paragraphs[0].text == "静态页脚"
+
+
+def test_template_restored_after_slicing(template_file):
+    compiled = CompiledTemplate(template_file, PlaceholderMatcher(REPLACEMENT_CONFIG))
+    before = [r.text for r in compiled.visits]
+    xml_template = XmlTemplate(compiled)
+    assert [r.text for r in compiled.visits] == before
+    assert len(xml_template.dynamic_parts) == 2  # 正文和页眉含插槽，页脚为静态部件